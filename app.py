@@ -1,45 +1,71 @@
-from flask import Flask, render_template, request, jsonify, send_file
-import joblib
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
+import io
 import json
 import os
-import pandas as pd
-from datetime import datetime
-from ml.predict import predict_disease
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+import time
+# Only flask and stdlib-only modules are imported up front; the model,
+# pandas and reportlab modules are imported on first use or by warm_up()
+from ml import timing
+from ml.serving import (SEARCH_MAX_AGE, InvalidSymptoms, get_batcher, get_report_status, readiness,
+                        run_prediction, search_page, start_warm_up, symptom_names)
 
 app = Flask(__name__)
-
-# Load symptom list for autocomplete
-try:
-    symptom_cols = joblib.load('models/symptom_columns.pkl')
-    SYMPTOMS = sorted([s.replace('_', ' ').title() for s in symptom_cols])
-except:
-    SYMPTOMS = []
+app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MEDIPREDICT_MAX_BATCH_SIZE', 1000))
+# Start rendering the PDF right after /predict instead of on first download
+app.config['REPORT_PRERENDER'] = os.environ.get('MEDIPREDICT_REPORT_PRERENDER', '0') == '1'
+# Seconds /download-report waits for a render before answering 202
+app.config['REPORT_TIMEOUT'] = float(os.environ.get('MEDIPREDICT_REPORT_TIMEOUT', 10))
+# background: warm up in a thread at import; sync: before import returns;
+# off: leave it to the caller (gunicorn.conf.py warms up in the master)
+app.config['WARMUP'] = os.environ.get('MEDIPREDICT_WARMUP', 'background')
+
+# MEDIPREDICT_PROFILE=1 samples stacks into a flamegraph-ready .folded file
+timing.start_profiler_from_env()
+
+start_warm_up(app.config['WARMUP'], on_error=lambda e: app.logger.error(f"Warm-up Error: {e}"))
+
+@app.before_request
+def start_request_timer():
+    if timing.TIMING_ENABLED:
+        g.request_start = time.perf_counter()
+        g.stage_timings, g.timing_token = timing.start_collecting()
+
+@app.after_request
+def add_server_timing(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        total = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        timing.REQUEST_SECONDS.observe(route, total)
+        response.headers['Server-Timing'] = timing.server_timing_header(g.stage_timings, total)
+    return response
+
+@app.teardown_request
+def stop_request_timer(exc):
+    token = g.pop('timing_token', None)
+    if token is not None:
+        timing.stop_collecting(token)
 
 @app.route('/')
 def home():
-    return render_template('index.html', symptoms=SYMPTOMS)
+    return render_template('index.html')
 
 @app.route('/predict', methods=['POST'])
 def predict():
     symptoms = request.form.getlist('symptoms')
     if not symptoms or len(symptoms) < 3:
         error = "Please select at least 3 symptoms"
-        return render_template('index.html', symptoms=SYMPTOMS, error=error)
+        return render_template('index.html', selected=symptoms, error=error)
     
     try:
-        result = predict_disease(symptoms)
-        # Store last result in session or use a global for PDF generation (demo purpose)
-        # Note: In a real app, use a proper session or database
-        app.config['LAST_RESULT'] = result
-        return render_template('result.html', result=result)
+        from ml.report import get_report_store
+        result = run_prediction(symptoms)
+        # The report is addressed by a per-result token, not a shared global
+        report_token = get_report_store().put(result, prerender=app.config['REPORT_PRERENDER'])
+        return render_template('result.html', result=result, report_token=report_token)
     except Exception as e:
         app.logger.error(f"Prediction Error: {e}")
-        return render_template('index.html', symptoms=SYMPTOMS, error="An error occurred during prediction.")
+        return render_template('index.html', selected=symptoms, error="An error occurred during prediction.")
 
 @app.route('/api/predict', methods=['POST'])
 def api_predict():
@@ -50,14 +76,77 @@ def api_predict():
         return jsonify({'error': 'Please select at least 3 symptoms'}), 400
     
     try:
-        result = predict_disease(symptoms)
+        result = run_prediction(symptoms)
         return jsonify(result)
+    except InvalidSymptoms as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    """JSON API endpoint scoring many symptom sets in one request"""
+    data = request.get_json(silent=True) or {}
+    batch = data.get('batch') if isinstance(data, dict) else data
+    if not isinstance(batch, list) or not batch:
+        return jsonify({'error': 'Expected a non-empty "batch" list of symptom lists'}), 400
+    max_size = app.config['MAX_BATCH_SIZE']
+    if len(batch) > max_size:
+        return jsonify({'error': f'Batch too large: {len(batch)} > {max_size}'}), 413
+
+    # Invalid entries get an error object in place; the rest are scored together
+    valid = [i for i, symptoms in enumerate(batch)
+             if isinstance(symptoms, list) and len(symptoms) >= 3
+             and all(isinstance(s, str) for s in symptoms)]
+    results = [{'error': 'Please select at least 3 symptoms'}] * len(batch)
+    try:
+        from ml.predict import predict_diseases_batch
+        for i, result in zip(valid, predict_diseases_batch([batch[i] for i in valid])):
+            results[i] = result
+        return jsonify({'results': results})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/batching', methods=['GET'])
+def batching_stats():
+    batcher = get_batcher()
+    if batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **batcher.stats.snapshot()})
+
+@app.route('/api/stats/cache', methods=['GET'])
+def cache_stats():
+    from ml.cache import get_prediction_cache
+    return jsonify(get_prediction_cache().stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of the stage and request histograms"""
+    return Response(timing.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """200 once warm_up() has finished in this process (or its preloading master), else 503"""
+    is_ready, details = readiness()
+    return jsonify(details), 200 if is_ready else 503
+
 @app.route('/api/symptoms', methods=['GET'])
 def get_symptoms():
-    return jsonify({'symptoms': SYMPTOMS})
+    return jsonify({'symptoms': symptom_names()})
+
+@app.route('/api/symptoms/search', methods=['GET'])
+def search_symptoms():
+    """Ranked symptom matches for autocomplete, one page at a time"""
+    try:
+        etag, page = search_page(request.args.get('q', ''), request.args.get('limit', 10),
+                                 request.args.get('offset', 0), request.if_none_match)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    response = app.response_class(status=304) if page is None else jsonify(page)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = SEARCH_MAX_AGE
+    return response
 
 @app.route('/about')
 def about():
@@ -66,60 +155,37 @@ def about():
 @app.route('/diseases')
 def diseases():
     try:
-        desc_df = pd.read_csv('data/symptom_Description.csv')
-        diseases_list = desc_df.to_dict('records')
+        from ml.reference import get_reference_data
+        diseases_list = get_reference_data().disease_records
     except:
         diseases_list = []
     return render_template('diseases.html', diseases=diseases_list)
 
-@app.route('/download-report')
-def download_report():
-    result = app.config.get('LAST_RESULT')
-    if not result:
+@app.route('/report/<token>/status')
+def report_status(token):
+    """Report render status; asking for it starts a lazy render"""
+    body, status = get_report_status(token)
+    return jsonify(body), status
+
+@app.route('/download-report', defaults={'token': None})
+@app.route('/download-report/<token>')
+def download_report(token):
+    from ml.report import get_report_store
+    reports = get_report_store()
+    if not token or reports.status(token) == 'unknown':
         return "No report data found. Please perform a prediction first.", 404
-    
-    report_path = 'medical_report.pdf'
-    doc = SimpleDocTemplate(report_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Header
-    elements.append(Paragraph("MediPredict AI - Patient Report", styles['Title']))
-    elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Symptoms
-    elements.append(Paragraph("Symptoms Entered:", styles['Heading2']))
-    elements.append(Paragraph(", ".join(result['symptoms_entered']), styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Prediction
-    elements.append(Paragraph(f"Primary Predicted Disease: {result['primary_prediction']}", styles['Heading2']))
-    elements.append(Paragraph(f"Confidence Score: {result['confidence']}%", styles['Normal']))
-    elements.append(Paragraph(f"Risk Level: {result['risk_level']}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Description
-    elements.append(Paragraph("Disease Description:", styles['Heading2']))
-    elements.append(Paragraph(result['description'], styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Precautions
-    elements.append(Paragraph("Recommended Precautions:", styles['Heading2']))
-    for p in result['precautions']:
-        elements.append(Paragraph(f"- {p}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Disclaimer
-    elements.append(Spacer(1, 24))
-    elements.append(Paragraph("--- MEDICAL DISCLAIMER ---", styles['Heading3']))
-    disclaimer_style = styles['Normal']
-    disclaimer_style.textColor = colors.red
-    elements.append(Paragraph("This tool is for educational purposes only. Always consult a certified medical professional. The predictions provided by this AI should not be taken as a final medical diagnosis.", disclaimer_style))
-
-    doc.build(elements)
-    
-    return send_file(report_path, as_attachment=True)
+    try:
+        pdf = reports.get_pdf(token, timeout=app.config['REPORT_TIMEOUT'])
+    except Exception as e:
+        app.logger.error(f"Report Error: {e}")
+        return "The report could not be generated.", 500
+    if pdf is None:
+        # Still rendering; the client can poll /report/<token>/status
+        response = jsonify({'status': 'pending', 'status_url': f'/report/{token}/status'})
+        response.headers['Retry-After'] = '1'
+        return response, 202
+    return send_file(io.BytesIO(pdf), as_attachment=True,
+                     download_name='medical_report.pdf', mimetype='application/pdf')
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,323 @@
+"""
+Async serving mode: the JSON API and report endpoints of app.py as a plain
+ASGI application, for uvicorn.
+
+    python asgi.py
+    uvicorn asgi:app --port 8000 --timeout-keep-alive 75
+
+The event loop only parses requests and writes responses. Inference, symptom
+search and report rendering run in a bounded thread pool. Once
+MEDIPREDICT_ASYNC_MAX_PENDING tasks are queued or running, new requests get
+a 503 with Retry-After straight away instead of waiting in an unbounded
+queue. Every request has a deadline of MEDIPREDICT_ASYNC_TIMEOUT seconds (504).
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from ml import timing
+from ml.serving import (SEARCH_MAX_AGE, InvalidSymptoms, get_report_status, readiness, run_prediction,
+                        search_page, start_warm_up, symptom_names)
+
+# Inference threads; numpy releases the GIL for most of the work
+MAX_WORKERS = int(os.environ.get('MEDIPREDICT_ASYNC_WORKERS', 4))
+# Tasks queued or running before new requests are shed with a 503
+MAX_PENDING = int(os.environ.get('MEDIPREDICT_ASYNC_MAX_PENDING', 64))
+# Seconds a request may take end to end before it gets a 504
+REQUEST_TIMEOUT = float(os.environ.get('MEDIPREDICT_ASYNC_TIMEOUT', 10))
+# Seconds /download-report waits for a render before answering 202
+REPORT_TIMEOUT = float(os.environ.get('MEDIPREDICT_REPORT_TIMEOUT', 10))
+# Idle seconds a keep-alive connection stays open (longer than a typical
+# load balancer's idle timeout, so the balancer closes first)
+KEEP_ALIVE = int(os.environ.get('MEDIPREDICT_KEEPALIVE', 75))
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    A thread pool that refuses work instead of queueing it without limit:
+    submit() raises Overloaded once max_pending tasks are queued or running.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded()
+            self._pending += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'pending': self._pending, 'max_pending': self.max_pending,
+                    'workers': self._pool._max_workers, 'rejected': self.rejected}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+EXECUTOR = BoundedExecutor(MAX_WORKERS, MAX_PENDING)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+
+def _collect_timings(fn, *args):
+    # Runs on a pool thread: stage timers there feed this request's Server-Timing
+    timings, token = timing.start_collecting()
+    try:
+        return fn(*args), timings
+    finally:
+        timing.stop_collecting(token)
+
+
+async def offload(request, fn, *args):
+    """fn(*args) on the inference pool; 503 when the pool is saturated."""
+    try:
+        future = EXECUTOR.submit(_collect_timings, fn, *args)
+    except Overloaded:
+        raise HTTPError(503, 'Server is busy, retry shortly', [('retry-after', '1')])
+    # Cancelling the await (request timeout) also drops the task if it has not started
+    result, timings = await asyncio.wrap_future(future)
+    request.timings.extend(timings)
+    return result
+
+
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query = {k: v[0] for k, v in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        self.headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+        self.timings = []
+
+    async def body(self):
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    async def json(self):
+        try:
+            return json.loads(await self.body() or b'null')
+        except ValueError:
+            raise HTTPError(400, 'Request body is not valid JSON')
+
+
+class Response:
+    def __init__(self, body=b'', status=200, content_type='application/json', headers=()):
+        self.body = body
+        self.status = status
+        self.headers = [('content-type', content_type), *headers]
+
+
+def json_response(data, status=200, headers=()):
+    return Response(json.dumps(data).encode('utf-8'), status, headers=headers)
+
+
+# --- Endpoints ---------------------------------------------------------------
+
+def _predict_and_store(symptoms):
+    from ml.report import get_report_store
+    result = run_prediction(symptoms)
+    return result, get_report_store().put(result)
+
+
+async def api_predict(request):
+    data = await request.json()
+    symptoms = data.get('symptoms', []) if isinstance(data, dict) else []
+    if not symptoms or len(symptoms) < 3:
+        return json_response({'error': 'Please select at least 3 symptoms'}, 400)
+    try:
+        result, report_token = await offload(request, _predict_and_store, symptoms)
+    except HTTPError:
+        raise
+    except InvalidSymptoms as e:
+        return json_response({'error': str(e)}, 400)
+    except Exception as e:
+        return json_response({'error': str(e)}, 500)
+    # Same body as the Flask endpoint; the report is linked from a header
+    return json_response(result, headers=[('link', f'</download-report/{report_token}>; rel="report"')])
+
+
+async def get_symptoms(request):
+    return json_response({'symptoms': await offload(request, symptom_names)})
+
+
+async def search_symptoms(request):
+    known_etags = {tag.strip().strip('"') for tag in request.headers.get('if-none-match', '').split(',')}
+    try:
+        etag, page = await offload(request, search_page, request.query.get('q', ''),
+                                   request.query.get('limit', 10), request.query.get('offset', 0), known_etags)
+    except ValueError:
+        return json_response({'error': 'limit and offset must be integers'}, 400)
+    headers = [('etag', f'"{etag}"'), ('cache-control', f'public, max-age={SEARCH_MAX_AGE}')]
+    if page is None:
+        return Response(b'', 304, headers=headers)
+    return json_response(page, headers=headers)
+
+
+async def report_status(request, token):
+    body, status = get_report_status(token)
+    return json_response(body, status)
+
+
+async def download_report(request, token):
+    from ml.report import get_report_store
+    reports = get_report_store()
+    if reports.status(token) == 'unknown':
+        return Response(b'No report data found. Please perform a prediction first.', 404,
+                        content_type='text/plain; charset=utf-8')
+    # Rendering runs in the report store's own pool; shield it so a timeout
+    # here leaves it running for the next poll. The wait ends before the
+    # request deadline so a slow render gets a 202, not a 504.
+    future = reports.render_async(token)
+    try:
+        if future is None:
+            pdf = reports.get_pdf(token, timeout=0)
+        else:
+            pdf = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                         min(REPORT_TIMEOUT, 0.8 * REQUEST_TIMEOUT))
+    except asyncio.TimeoutError:
+        pdf = None
+    except Exception:
+        return Response(b'The report could not be generated.', 500, content_type='text/plain; charset=utf-8')
+    if pdf is None:
+        return json_response({'status': 'pending', 'status_url': f'/report/{token}/status'}, 202,
+                             headers=[('retry-after', '1')])
+    return Response(pdf, content_type='application/pdf',
+                    headers=[('content-disposition', 'attachment; filename=medical_report.pdf')])
+
+
+async def ready(request):
+    is_ready, details = readiness()
+    return json_response(details, 200 if is_ready else 503)
+
+
+async def executor_stats(request):
+    return json_response(EXECUTOR.stats())
+
+
+async def metrics(request):
+    return Response(timing.render_metrics().encode('utf-8'), content_type='text/plain; version=0.0.4')
+
+
+ROUTES = {
+    ('POST', '/api/predict'): api_predict,
+    ('GET', '/api/symptoms'): get_symptoms,
+    ('GET', '/api/symptoms/search'): search_symptoms,
+    ('GET', '/api/stats/executor'): executor_stats,
+    ('GET', '/ready'): ready,
+    ('GET', '/metrics'): metrics,
+}
+TOKEN_ROUTES = [
+    (re.compile(r'^/report/([0-9a-f]+)/status$'), '/report/<token>/status', report_status),
+    (re.compile(r'^/download-report/([0-9a-f]+)$'), '/download-report/<token>', download_report),
+]
+
+
+def resolve(method, path):
+    """(route pattern, handler, path arguments), raising 404 / 405."""
+    handler = ROUTES.get((method, path))
+    if handler is not None:
+        return path, handler, ()
+    if any(route_path == path for _, route_path in ROUTES):
+        raise HTTPError(405, 'Method not allowed')
+    for pattern, route, handler in TOKEN_ROUTES:
+        match = pattern.match(path)
+        if match:
+            if method != 'GET':
+                raise HTTPError(405, 'Method not allowed')
+            return route, handler, match.groups()
+    raise HTTPError(404, 'Not found')
+
+
+# --- ASGI entry point --------------------------------------------------------
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    start = time.perf_counter()
+    request = Request(scope, receive)
+    route = 'unmatched'
+    try:
+        route, handler, args = resolve(request.method, request.path)
+        response = await asyncio.wait_for(handler(request, *args), REQUEST_TIMEOUT)
+    except ClientDisconnected:
+        return
+    except HTTPError as e:
+        response = json_response({'error': e.message}, e.status, headers=e.headers)
+    except asyncio.TimeoutError:
+        response = json_response({'error': 'Request timed out'}, 504)
+
+    total = time.perf_counter() - start
+    if timing.TIMING_ENABLED:
+        timing.REQUEST_SECONDS.observe(route, total)
+        response.headers.append(('server-timing', timing.server_timing_header(request.timings, total)))
+    response.headers.append(('content-length', str(len(response.body))))
+    await send({'type': 'http.response.start', 'status': response.status,
+                'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in response.headers]})
+    await send({'type': 'http.response.body', 'body': response.body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            EXECUTOR.shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+# MEDIPREDICT_PROFILE=1 samples stacks into a flamegraph-ready .folded file
+timing.start_profiler_from_env()
+
+# Same modes as app.py; models load off the event loop, /ready reports when done
+start_warm_up(os.environ.get('MEDIPREDICT_WARMUP', 'background'))
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi:app', host=os.environ.get('MEDIPREDICT_HOST', '127.0.0.1'),
+                port=int(os.environ.get('MEDIPREDICT_PORT', 8000)),
+                timeout_keep_alive=KEEP_ALIVE, log_level='warning')
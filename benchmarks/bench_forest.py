@@ -0,0 +1,46 @@
+"""
+Compare the flattened random forest (ml/forest.py) with sklearn's
+RandomForestClassifier.predict_proba.
+
+    python -m benchmarks.bench_forest
+"""
+import time
+import numpy as np
+import pandas as pd
+from ml.registry import get_models
+from ml.forest import flatten_forest
+
+
+def time_call(fn, X, repeat):
+    fn(X)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    models = get_models()
+    rf = models.rf
+    forest = flatten_forest(rf)
+
+    df = pd.read_csv('data/Training.csv')
+    X = df[models.cols].to_numpy(dtype=np.float32)
+
+    # Bit-for-bit check; sklearn only sums trees in a fixed order with n_jobs=1
+    n_jobs = rf.n_jobs
+    rf.n_jobs = 1
+    exact = np.array_equal(rf.predict_proba(X), forest.predict_proba(X))
+    rf.n_jobs = n_jobs
+    print(f"predict_proba identical: {exact}")
+
+    print(f"{'Rows':>6} | {'sklearn ms':>11} | {'flat ms':>9} | {'speedup':>7}")
+    print("-" * 44)
+    for n_rows, repeat in ((1, 200), (32, 50), (len(X), 3)):
+        sk = time_call(rf.predict_proba, X[:n_rows], repeat)
+        flat = time_call(forest.predict_proba, X[:n_rows], repeat)
+        print(f"{n_rows:>6} | {sk:>11.3f} | {flat:>9.3f} | {sk / flat:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
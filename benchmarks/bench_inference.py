@@ -0,0 +1,220 @@
+"""
+Inference benchmark: predict_disease in-process and the Flask app through
+its test client, on synthetic symptom sets sampled from data/dataset.csv.
+Reports p50/p95/p99 latency, requests per second and peak RSS per stage
+(model loading, CSV reading, encoding, each model's predict, report
+rendering, end to end) and writes everything to a JSON file.
+
+    python -m benchmarks.bench_inference
+    python -m benchmarks.bench_inference --requests 2000 --compare benchmarks/results/<old>.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sklearn
+from ml.registry import MODELS_PATH, ModelRegistry, get_models
+from ml.reference import build_reference_data
+from ml.cache import get_prediction_cache
+from ml.predict import predict_disease, predict_diseases_batch
+from ml.report import build_report_pdf
+
+SOURCE = 'data/dataset.csv'
+RESULTS_DIR = 'benchmarks/results'
+
+
+def sample_symptom_sets(n, seed=0, min_symptoms=3):
+    """n random subsets (at least min_symptoms) of the symptom rows in dataset.csv."""
+    rows = [
+        [s.strip() for s in row.dropna().astype(str)]
+        for _, row in pd.read_csv(SOURCE).iloc[:, 1:].iterrows()
+    ]
+    rows = [r for r in rows if len(r) >= min_symptoms]
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in rng.integers(0, len(rows), n):
+        row = rows[i]
+        k = rng.integers(min_symptoms, len(row) + 1)
+        samples.append([row[j] for j in sorted(rng.choice(len(row), k, replace=False))])
+    return samples
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (2**20 if platform.system() == 'Darwin' else 2**10)
+
+
+def summarize(latencies_s, wall_s=None):
+    ms = np.asarray(latencies_s) * 1000
+    wall_s = wall_s if wall_s is not None else float(np.sum(latencies_s))
+    return {
+        'n': int(len(ms)),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'max_ms': float(ms.max()),
+        'rps': float(len(ms) / wall_s) if wall_s > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_timed(fn, items, warmup=3):
+    for item in items[:warmup]:
+        fn(item)
+    latencies = []
+    wall_start = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - wall_start)
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_stages(samples, n_reports):
+    stages = {}
+
+    # Cold loads, each through a fresh registry / reference build
+    stages['load models'] = run_timed(lambda _: ModelRegistry(MODELS_PATH).get(), [None] * 3, warmup=0)
+    stages['read csv'] = run_timed(lambda _: build_reference_data(), [None] * 5, warmup=1)
+
+    models = get_models()
+    encoder = models.encoder
+    stages['encode'] = run_timed(lambda s: encoder.matrix_from_indices([encoder.indices(s)]), samples)
+
+    rows = [encoder.encode(s) for s in samples]
+    stages['predict rf'] = run_timed(models.forest.predict_proba, rows)
+    stages['predict nb'] = run_timed(models.nb.predict_proba, rows)
+    stages['predict svm'] = run_timed(models.svm.predict_proba, rows)
+
+    results = [predict_disease(s) for s in samples[:n_reports]]
+    stages['render report'] = run_timed(build_report_pdf, results, warmup=1)
+    return stages
+
+
+def bench_end_to_end(samples):
+    from app import app
+
+    stages = {}
+    cache = get_prediction_cache()
+    maxsize = cache.maxsize
+    client = app.test_client()
+    try:
+        # Every request reaches the models
+        cache.maxsize = 0
+        stages['predict_disease'] = run_timed(predict_disease, samples)
+        stages['flask /api/predict'] = run_timed(
+            lambda s: client.post('/api/predict', json={'symptoms': s}), samples)
+        stages['flask /predict'] = run_timed(
+            lambda s: client.post('/predict', data={'symptoms': s}), samples)
+        # Repeated symptom sets, served from the cache
+        cache.maxsize = maxsize
+        if cache.enabled:
+            repeated = samples[:50] * (len(samples) // 50 or 1)
+            for s in samples[:50]:
+                predict_disease(s)
+            stages['predict_disease cached'] = run_timed(predict_disease, repeated)
+    finally:
+        cache.maxsize = maxsize
+    return stages
+
+
+def bench_throughput(samples, batch_sizes):
+    """Rows per second of predict_diseases_batch as the batch grows."""
+    cache = get_prediction_cache()
+    maxsize = cache.maxsize
+    curve = []
+    try:
+        cache.maxsize = 0
+        for size in batch_sizes:
+            batches = [samples[i:i + size] for i in range(0, len(samples) - size + 1, size)] or [samples[:size]]
+            stats = run_timed(predict_diseases_batch, batches, warmup=1)
+            curve.append({'batch_size': size, 'batch_p50_ms': stats['p50_ms'],
+                          'rows_per_s': stats['rps'] * size})
+    finally:
+        cache.maxsize = maxsize
+    return curve
+
+
+def print_report(result):
+    print(f"commit {result['commit']}  sklearn {result['versions']['sklearn']}  "
+          f"{result['config']['requests']} requests")
+    print(f"{'Stage':<24} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'req/s':>9} | {'RSS MiB':>8}")
+    print("-" * 78)
+    for name, s in result['stages'].items():
+        print(f"{name:<24} | {s['p50_ms']:>8.3f} | {s['p95_ms']:>8.3f} | {s['p99_ms']:>8.3f} | "
+              f"{s['rps']:>9.1f} | {s['peak_rss_mb']:>8.1f}")
+    print("-" * 78)
+    print(f"{'Batch size':>10} | {'p50 ms':>9} | {'rows/s':>10}")
+    for point in result['throughput']:
+        print(f"{point['batch_size']:>10} | {point['batch_p50_ms']:>9.2f} | {point['rows_per_s']:>10.0f}")
+
+
+def print_comparison(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline['commit']} ({baseline_path}): change in p50 / p95")
+    for name, s in result['stages'].items():
+        old = baseline['stages'].get(name)
+        if old is None:
+            continue
+        d50 = (s['p50_ms'] / old['p50_ms'] - 1) * 100 if old['p50_ms'] else 0.0
+        d95 = (s['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0.0
+        print(f"  {name:<24} {d50:>+7.1f}% {d95:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference latency / throughput benchmark")
+    parser.add_argument('--requests', type=int, default=500, help="symptom sets per stage")
+    parser.add_argument('--reports', type=int, default=20, help="PDF reports to render")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="JSON path (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', default=None, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    samples = sample_symptom_sets(args.requests, seed=args.seed)
+    stages = bench_stages(samples, args.reports)
+    stages.update(bench_end_to_end(samples))
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'versions': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'sklearn': sklearn.__version__},
+        'config': {'requests': args.requests, 'reports': args.reports, 'seed': args.seed,
+                   **{k: v for k, v in os.environ.items() if k.startswith('MEDIPREDICT_')}},
+        'stages': stages,
+        'throughput': bench_throughput(samples, args.batch_sizes),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print_report(result)
+    if args.compare:
+        print_comparison(result, args.compare)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
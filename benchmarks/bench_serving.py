@@ -0,0 +1,165 @@
+"""
+HTTP load test of POST /api/predict: the Flask app under gunicorn against
+the async app (asgi.py) under uvicorn, on the same symptom sets as
+bench_inference. Each client thread keeps one keep-alive connection and
+sends requests back to back. Reports latency percentiles, throughput and
+the status codes seen (503 = shed by backpressure, 504 = timed out).
+Servers started here run with the prediction cache off
+(MEDIPREDICT_CACHE_SIZE=0); every concurrency level resends the same
+samples, so with it on they would time cache lookups, not inference.
+
+    python -m benchmarks.bench_serving
+    python -m benchmarks.bench_serving --modes asgi --concurrency 64 --requests 5000
+    python -m benchmarks.bench_serving --url http://127.0.0.1:8000   # an already running server
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+from benchmarks.bench_inference import git_commit, sample_symptom_sets
+from benchmarks.bench_worker_memory import free_port, wait_for_workers
+
+RESULTS_DIR = 'benchmarks/results'
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ, MEDIPREDICT_BIND=f'127.0.0.1:{port}', MEDIPREDICT_PORT=str(port),
+               WEB_CONCURRENCY=str(workers), MEDIPREDICT_CACHE_SIZE='0')
+    if mode == 'flask':
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--workers', str(workers),
+               '--timeout-keep-alive', os.environ.get('MEDIPREDICT_KEEPALIVE', '75'), '--log-level', 'warning']
+    server = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_workers(f'http://127.0.0.1:{port}/ready', workers, timeout=120)
+    return server
+
+
+def run_load(url, samples, concurrency, timeout=30):
+    """Send every sample once across concurrency keep-alive connections."""
+    parts = urlsplit(url)
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    next_item = iter(range(len(samples)))
+    connects = Counter()
+
+    def client():
+        conn = None
+        while True:
+            with lock:
+                i = next(next_item, None)
+            if i is None:
+                break
+            if conn is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+                connects['opened'] += 1
+            body = json.dumps({'symptoms': samples[i]})
+            start = time.perf_counter()
+            try:
+                conn.request('POST', '/api/predict', body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                status = 'error'
+                conn.close()
+                conn = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        'n': len(ms),
+        'concurrency': concurrency,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'rps': len(ms) / wall,
+        'ok_rps': statuses.get(200, 0) / wall,
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        'connections': connects['opened'],
+    }
+
+
+def print_report(results):
+    print(f"{'Mode':<8} | {'conc':>5} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'req/s':>8} | {'conns':>5} | statuses")
+    print("-" * 90)
+    for mode, runs in results.items():
+        for r in runs:
+            print(f"{mode:<8} | {r['concurrency']:>5} | {r['p50_ms']:>8.2f} | {r['p95_ms']:>8.2f} | "
+                  f"{r['p99_ms']:>8.2f} | {r['rps']:>8.1f} | {r['connections']:>5} | {r['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/predict: Flask (gunicorn) vs async (uvicorn)")
+    parser.add_argument('--modes', nargs='+', choices=['flask', 'asgi'], default=['flask', 'asgi'])
+    parser.add_argument('--url', default=None, help="load an already running server instead")
+    parser.add_argument('--workers', type=int, default=1, help="server processes per mode")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=1000, help="requests per concurrency level")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="JSON path (default: benchmarks/results/serving-<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    samples = sample_symptom_sets(args.requests, seed=args.seed)
+    targets = [('url', args.url)] if args.url else [(mode, None) for mode in args.modes]
+    results = {}
+    for mode, url in targets:
+        server = None
+        if url is None:
+            port = free_port()
+            server = start_server(mode, port, args.workers)
+            url = f'http://127.0.0.1:{port}'
+        try:
+            run_load(url, samples[:50], max(args.concurrency))  # warm caches and connections
+            results[mode] = [run_load(url, samples, c) for c in args.concurrency]
+        finally:
+            if server is not None:
+                server.send_signal(signal.SIGTERM)
+                server.wait(30)
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {'requests': args.requests, 'workers': args.workers, 'seed': args.seed,
+                   'cache': 'off' if args.url is None else 'server default',
+                   **{k: v for k, v in os.environ.items() if k.startswith('MEDIPREDICT_')}},
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"serving-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print_report(results)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
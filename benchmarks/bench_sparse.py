@@ -0,0 +1,80 @@
+"""
+Dense vs CSR inference: latency and peak memory per stage at several batch
+sizes. Rows are training rows resampled with replacement (3-17 symptoms each).
+
+    python -m benchmarks.bench_sparse
+    python -m benchmarks.bench_sparse --sizes 1 1000 1000000 --stages encode nb svm
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from ml.registry import get_models
+from ml.dataset import load_training_data
+from ml.predict import call_model
+
+STAGES = ('encode', 'rf', 'nb', 'svm')
+
+
+def sample_index_lists(n_rows, cols, seed=0):
+    data = load_training_data()
+    X = np.asarray(data.features(cols))
+    pool = [np.flatnonzero(row).tolist() for row in X]
+    picks = np.random.default_rng(seed).integers(0, len(pool), n_rows)
+    return [pool[i] for i in picks]
+
+
+def measure(fn, repeat):
+    """(mean ms, peak traced MiB) of fn(); the peak is from one extra call."""
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    ms = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return ms, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1000, 1000000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    args = parser.parse_args()
+
+    models = get_models()
+    encoder = models.encoder
+    print(f"RF engine: flat forest | NB: {type(models.nb).__name__} | SVM: {type(models.svm).__name__}")
+    print(f"{'Rows':>8} | {'Stage':<6} | {'dense ms':>10} | {'csr ms':>10} | "
+          f"{'dense MiB':>9} | {'csr MiB':>8}")
+    print("-" * 68)
+    for n_rows in args.sizes:
+        index_lists = sample_index_lists(n_rows, models.cols)
+        repeat = max(1, min(200, 2000 // n_rows))
+        X_dense = encoder.matrix_from_indices(index_lists)
+        X_csr = encoder.csr_from_indices(index_lists)
+        assert np.array_equal(X_csr.toarray(), X_dense)
+        for stage in args.stages:
+            if stage == 'encode':
+                dense = measure(lambda: encoder.matrix_from_indices(index_lists), repeat)
+                csr = measure(lambda: encoder.csr_from_indices(index_lists), repeat)
+            else:
+                model = {'rf': models.forest, 'nb': models.nb, 'svm': models.svm}[stage]
+                dense = measure(lambda: call_model(model, 'predict_proba', X_dense), repeat)
+                csr = measure(lambda: call_model(model, 'predict_proba', X_csr), repeat)
+                # Same answer both ways
+                check = slice(0, min(n_rows, 4096))
+                assert np.allclose(call_model(model, 'predict_proba', X_dense[check]),
+                                   call_model(model, 'predict_proba', X_csr[check]))
+            print(f"{n_rows:>8} | {stage:<6} | {dense[0]:>10.3f} | {csr[0]:>10.3f} | "
+                  f"{dense[1]:>9.2f} | {csr[1]:>8.2f}")
+        dense_mb = X_dense.nbytes / 2**20
+        csr_mb = (X_csr.data.nbytes + X_csr.indices.nbytes + X_csr.indptr.nbytes) / 2**20
+        print(f"{n_rows:>8} | {'matrix':<6} | {'':>10} | {'':>10} | {dense_mb:>9.2f} | {csr_mb:>8.2f}")
+        print("-" * 68)
+
+
+if __name__ == "__main__":
+    main()
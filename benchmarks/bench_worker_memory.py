@@ -0,0 +1,136 @@
+"""
+Per-worker memory of the gunicorn app, with the model artifacts read into
+each worker (MEDIPREDICT_MMAP=0) and memory-mapped (MEDIPREDICT_MMAP=1),
+with and without preloading the app in the master. Starts gunicorn with
+gunicorn.conf.py for each setting, waits until every worker has answered
+/ready, then reads /proc/<pid>/smaps_rollup (Linux only).
+
+Pss splits each shared page between the processes mapping it, so the sum
+of Pss over the workers is what they cost together.
+
+    python -m benchmarks.bench_worker_memory
+    python -m benchmarks.bench_worker_memory --workers 4 --no-preload
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from benchmarks.bench_inference import git_commit
+
+RESULTS_DIR = 'benchmarks/results'
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup_mb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            field, _, rest = line.partition(':')
+            if field in SMAPS_FIELDS:
+                values[field] = int(rest.split()[0]) / 1024
+    return {
+        'rss_mb': round(values['Rss'], 1),
+        'pss_mb': round(values['Pss'], 1),
+        'shared_mb': round(values['Shared_Clean'] + values['Shared_Dirty'], 1),
+        'private_mb': round(values['Private_Clean'] + values['Private_Dirty'], 1),
+    }
+
+
+def wait_for_workers(url, n_workers, timeout):
+    """Poll /ready until n_workers distinct pids have answered 200."""
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while len(pids) < n_workers:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"only {len(pids)} of {n_workers} workers ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                pids.add(json.load(response)['pid'])
+        except OSError:
+            # Not listening yet, still warming up (503) or timed out
+            time.sleep(0.2)
+    return sorted(pids)
+
+
+def measure(mmap, preload, n_workers, timeout=120):
+    port = free_port()
+    env = dict(os.environ, MEDIPREDICT_MMAP='1' if mmap else '0',
+               MEDIPREDICT_PRELOAD='1' if preload else '0',
+               MEDIPREDICT_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(n_workers))
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        pids = wait_for_workers(f'http://127.0.0.1:{port}/ready', n_workers, timeout)
+        # A few predictions per worker, so state built on first use is counted
+        body = json.dumps({'symptoms': ['itching', 'skin_rash', 'nodal_skin_eruptions']}).encode()
+        for _ in range(4 * n_workers):
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/api/predict', data=body,
+                                             headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(request, timeout=30).read()
+        workers = [smaps_rollup_mb(pid) for pid in pids]
+        return {
+            'mmap': mmap,
+            'preload': preload,
+            'master': smaps_rollup_mb(master.pid),
+            'workers': workers,
+            'worker_pss_total_mb': round(sum(w['pss_mb'] for w in workers), 1),
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(30)
+
+
+def print_report(runs):
+    print(f"{'Setting':<22} | {'RSS':>7} | {'PSS':>7} | {'Shared':>7} | {'Private':>7} | {'Sum PSS':>8}")
+    print("-" * 75)
+    for run in runs:
+        name = f"{'mmap' if run['mmap'] else 'copy'}, {'preload' if run['preload'] else 'no preload'}"
+        n = len(run['workers'])
+        mean = {k: sum(w[k] for w in run['workers']) / n for k in run['workers'][0]}
+        print(f"{name:<22} | {mean['rss_mb']:>7.1f} | {mean['pss_mb']:>7.1f} | {mean['shared_mb']:>7.1f} | "
+              f"{mean['private_mb']:>7.1f} | {run['worker_pss_total_mb']:>8.1f}")
+    print("(MiB, mean per worker; Sum PSS is all workers together)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with and without memory-mapped models")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help="only measure workers that each import the app themselves")
+    parser.add_argument('--output', default=None, help="JSON path (default: benchmarks/results/memory-<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    preloads = (False, True) if args.preload else (False,)
+    runs = [measure(mmap, preload, args.workers) for preload in preloads for mmap in (False, True)]
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'workers': args.workers,
+        'model_bytes': {f: os.path.getsize(os.path.join('models', f)) for f in sorted(os.listdir('models'))
+                        if f.endswith(('.pkl', '.joblib'))},
+        'runs': runs,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"memory-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print_report(runs)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Import-time budget for the web app. Imports app.py in a fresh interpreter
+(with warm-up off) under -X importtime, and fails if that takes longer
+than the budget or leaves a heavy module loaded: those belong in warm_up()
+or behind a lazy import.
+
+    python -m benchmarks.check_import_time
+    python -m benchmarks.check_import_time --budget-ms 500 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Must not be imported by `import app`
+HEAVY_MODULES = ('sklearn', 'scipy', 'pandas', 'joblib', 'reportlab', 'matplotlib')
+DEFAULT_BUDGET_MS = float(os.environ.get('MEDIPREDICT_IMPORT_BUDGET_MS', 400))
+
+
+def measure(module='app', runs=3):
+    """
+    Best of runs: (cumulative microseconds of `import module`, cumulative
+    microseconds of each module it imports directly, heavy modules loaded).
+    """
+    env = dict(os.environ, MEDIPREDICT_WARMUP='off', MEDIPREDICT_PROFILE='0')
+    code = (f"import sys; import {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              capture_output=True, text=True, env=env, check=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Nesting is shown as two extra spaces of indent per level
+            rows.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+        # A module's line comes right after those of the imports it triggered
+        end = next(i for i, (_, name, _) in enumerate(rows) if name == module)
+        depth, _, total = rows[end]
+        start = end
+        while start > 0 and rows[start - 1][0] > depth:
+            start -= 1
+        children = {name: us for d, name, us in rows[start:end] if d == depth + 2}
+        if best is None or total < best[0]:
+            loaded = [m for m in proc.stdout.strip().split(',') if m]
+            best = (total, children, loaded)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if `import app` exceeds its import-time budget")
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="default 400, or MEDIPREDICT_IMPORT_BUDGET_MS")
+    parser.add_argument('--runs', type=int, default=3, help="fresh interpreters; the fastest counts")
+    parser.add_argument('--top', type=int, default=10, help="slowest direct imports to list")
+    args = parser.parse_args()
+
+    total_us, children, heavy = measure(args.module, args.runs)
+    total_ms = total_us / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for us, name in sorted(((us, name) for name, us in children.items()), reverse=True)[:args.top]:
+        print(f"  {us / 1000:>8.1f} ms  {name}")
+
+    failed = False
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if heavy:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
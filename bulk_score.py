@@ -0,0 +1,14 @@
+"""
+Score a whole file of symptom records with the trained models:
+
+    python bulk_score.py data/dataset.csv predictions.csv
+    python bulk_score.py patients.jsonl predictions.jsonl --workers 4 --chunk-size 20000
+
+Input is a CSV shaped like data/dataset.csv (Symptom_1..Symptom_17) or
+JSONL. An interrupted run picks up from its checkpoint when rerun with
+the same arguments; see `python -m ml.bulk --help`.
+"""
+from ml.bulk import main
+
+if __name__ == "__main__":
+    main()
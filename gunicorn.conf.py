@@ -0,0 +1,49 @@
+"""
+gunicorn settings for the Flask app:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) and warm_up() loads
+the models, reference data, symptom index and report styles there, before
+any worker is forked. Workers start already warm and share those pages
+copy-on-write instead of each unpickling its own copy.
+"""
+import gc
+import os
+
+bind = os.environ.get('MEDIPREDICT_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('MEDIPREDICT_THREADS', 4))
+# Idle seconds a keep-alive connection stays open (same setting as asgi.py)
+keepalive = int(os.environ.get('MEDIPREDICT_KEEPALIVE', 75))
+# MEDIPREDICT_PRELOAD=0 imports and warms the app in each worker instead
+preload_app = os.environ.get('MEDIPREDICT_PRELOAD', '1') != '0'
+
+# Warm up synchronously in when_ready below rather than in a thread at
+# import: threads do not survive fork()
+os.environ.setdefault('MEDIPREDICT_WARMUP', 'off')
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    # app.py is already imported (preload_app); this loads what it will need
+    from ml.serving import warm_up
+    warm_up()
+    # Move everything loaded so far out of the collector's generations, so
+    # a collection in a worker does not write to (and un-share) those pages
+    gc.freeze()
+    server.log.info("Models warmed up in the master; forking workers")
+
+
+def post_fork(server, worker):
+    # The sampling profiler thread, like every other thread, stays behind in the master
+    from ml import timing
+    timing.start_profiler_from_env()
+
+
+def post_worker_init(worker):
+    # Without preload each worker loads its own models, before taking requests
+    if not worker.cfg.preload_app:
+        from ml.serving import warm_up
+        warm_up()
@@ -0,0 +1,250 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from ml.predict import RISK_LEVELS, evaluate_ensemble, risk_bands, severity_scores
+from ml.reference import get_reference_data
+from ml.registry import get_models
+
+# Streams a dataset.csv-shaped file (Symptom_1..Symptom_17, optionally
+# Disease) or JSONL through the ensemble in fixed-size chunks. Chunks are
+# scored in a process pool and written in input order, with at most a few
+# chunks in flight, so memory does not grow with the file. After every
+# chunk a checkpoint records how many input rows and output bytes are done.
+# Blank lines are skipped but still counted, so row numbers are line based.
+# Rows with fewer than MIN_SYMPTOMS entered symptoms get an error record,
+# the same check as /api/predict (unknown names still count, as there).
+
+CHUNK_SIZE = 10000
+MIN_SYMPTOMS = 3
+OUTPUT_FIELDS = ('row', 'prediction', 'confidence', 'top1', 'top1_pct', 'top2', 'top2_pct',
+                 'top3', 'top3_pct', 'nb_prediction', 'svm_prediction', 'model_agreement',
+                 'severity_score', 'risk_level', 'error')
+TOO_FEW_SYMPTOMS = f'fewer than {MIN_SYMPTOMS} symptoms'
+
+
+def _symptoms(values):
+    return [v.strip() for v in values if isinstance(v, str) and v.strip()]
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE, start=0):
+    """
+    Yield (first row offset, [symptom lists]) for every chunk from data row
+    start on. A blank line is None in the list.
+    """
+    if path.endswith(('.jsonl', '.ndjson')):
+        yield from _read_jsonl_chunks(path, chunk_size, start)
+        return
+    # Blank lines are kept (as all-NaN rows) so offsets match the line-based skiprows
+    reader = pd.read_csv(path, chunksize=chunk_size, dtype=str, skipinitialspace=True,
+                         skip_blank_lines=False, skiprows=range(1, start + 1) if start else None)
+    offset = start
+    for chunk in reader:
+        cols = [c for c in chunk.columns if c.startswith('Symptom')]
+        blank = chunk.isna().all(axis=1).to_numpy()
+        rows = [None if is_blank else _symptoms(values)
+                for values, is_blank in zip(chunk[cols].to_numpy(dtype=object), blank)]
+        yield offset, rows
+        offset += len(rows)
+
+
+def _jsonl_row(line):
+    if not line.strip():
+        return None
+    record = json.loads(line)
+    if 'symptoms' in record:
+        return _symptoms(record['symptoms'])
+    return _symptoms(v for k, v in record.items() if k.startswith('Symptom'))
+
+
+def _read_jsonl_chunks(path, chunk_size, start):
+    # One object per line: {"Symptom_1": "itching", ...} or {"symptoms": [...]}
+    offset, rows = start, []
+    with open(path, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            if i < start:
+                continue
+            rows.append(_jsonl_row(line))
+            if len(rows) == chunk_size:
+                yield offset, rows
+                offset, rows = offset + len(rows), []
+    if rows:
+        yield offset, rows
+
+
+def score_chunk(offset, rows):
+    """Output records for one chunk (none for blank lines); runs in a pool worker."""
+    models = get_models()
+    ref = get_reference_data()
+    indices = {r: models.encoder.indices(s) for r, s in enumerate(rows) if s is not None}
+    valid = [r for r in indices if len(rows[r]) >= MIN_SYMPTOMS]
+    outputs = {}
+    if valid:
+        X = models.encoder.csr_from_indices([indices[r] for r in valid])
+        ens = evaluate_ensemble(models, X)
+        rf_proba = ens['rf_proba']
+        top_idx = ens['top_idx']
+        top_names = models.rf_names[top_idx]
+        top_pct = np.round(np.take_along_axis(rf_proba, top_idx, axis=1) * 100, 2)
+        confidence = np.round(rf_proba.max(axis=1) * 100, 2)
+        severity = severity_scores(X, ref.severity_weights(models.cols))
+        bands = risk_bands(severity)
+        for j, r in enumerate(valid):
+            rf_pred, nb_pred, svm_pred = str(ens['rf_pred'][j]), str(ens['nb_pred'][j]), str(ens['svm_pred'][j])
+            outputs[r] = {
+                'prediction': rf_pred,
+                'confidence': float(confidence[j]),
+                'top3': [(str(name), float(pct)) for name, pct in zip(top_names[j], top_pct[j])],
+                'nb_prediction': nb_pred,
+                'svm_prediction': svm_pred,
+                'model_agreement': (rf_pred == nb_pred) + (rf_pred == svm_pred) + (nb_pred == svm_pred),
+                'severity_score': int(severity[j]),
+                'risk_level': RISK_LEVELS[bands[j]][0],
+            }
+
+    return [{'row': offset + r, **outputs.get(r, {'error': TOO_FEW_SYMPTOMS})} for r in indices]
+
+
+def _init_worker():
+    # Load once per worker process, not once per chunk
+    get_models()
+    get_reference_data()
+
+
+def format_records(records, fmt):
+    """Records as bytes in the output format ('csv' rows without header, or 'jsonl')."""
+    buf = io.StringIO()
+    if fmt == 'jsonl':
+        for record in records:
+            buf.write(json.dumps(record) + '\n')
+    else:
+        writer = csv.writer(buf)
+        for record in records:
+            if 'error' in record:
+                writer.writerow([record['row']] + [''] * (len(OUTPUT_FIELDS) - 2) + [record['error']])
+                continue
+            top = [v for name, pct in record['top3'] for v in (name, pct)]
+            top += [''] * (6 - len(top))
+            writer.writerow([record['row'], record['prediction'], record['confidence'], *top,
+                             record['nb_prediction'], record['svm_prediction'],
+                             record['model_agreement'], record['severity_score'], record['risk_level'], ''])
+    return buf.getvalue().encode('utf-8')
+
+
+def checkpoint_path(output):
+    return f"{output}.checkpoint"
+
+
+def load_checkpoint(output, input_path):
+    try:
+        with open(checkpoint_path(output)) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('input') != os.path.abspath(input_path):
+        raise ValueError(f"{checkpoint_path(output)} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+
+def save_checkpoint(output, input_path, rows_done, output_bytes):
+    path = checkpoint_path(output)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'input': os.path.abspath(input_path), 'rows_done': rows_done,
+                   'output_bytes': output_bytes}, f)
+    os.replace(tmp, path)
+
+
+def score_file(input_path, output_path, chunk_size=CHUNK_SIZE, workers=None,
+               resume=True, start=None, verbose=True):
+    """
+    Score every row of input_path into output_path (.csv or .jsonl).
+    With resume, an existing checkpoint restarts after the last chunk that
+    was fully written (the output is truncated to that point). start
+    overrides the input row to begin from. Returns the number of records written.
+    """
+    fmt = 'jsonl' if output_path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    checkpoint = load_checkpoint(output_path, input_path) if resume else None
+    if start is not None:
+        rows_done = start
+        output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    elif checkpoint is not None:
+        rows_done, output_bytes = checkpoint['rows_done'], checkpoint['output_bytes']
+    else:
+        rows_done, output_bytes = 0, 0
+    if output_bytes and not os.path.exists(output_path):
+        raise FileNotFoundError(f"{output_path} is gone but its checkpoint is not; rerun with --restart")
+
+    with open(output_path, 'r+b' if output_bytes else 'wb') as out:
+        # Drop anything written after the last checkpoint
+        out.truncate(output_bytes)
+        out.seek(output_bytes)
+        if output_bytes == 0 and fmt == 'csv':
+            out.write((','.join(OUTPUT_FIELDS) + '\r\n').encode('utf-8'))
+
+        started, scored = time.perf_counter(), 0
+
+        def write(end, records):
+            nonlocal rows_done, scored
+            out.write(format_records(records, fmt))
+            out.flush()
+            # end, not the last record's row: trailing blank lines are done too
+            rows_done = end
+            scored += len(records)
+            save_checkpoint(output_path, input_path, rows_done, out.tell())
+            if verbose:
+                rate = scored / max(time.perf_counter() - started, 1e-9)
+                print(f"  {rows_done} rows done ({rate:,.0f} rows/s)", flush=True)
+
+        chunks = read_chunks(input_path, chunk_size, start=rows_done)
+        workers = workers if workers is not None else os.cpu_count() or 1
+        if workers <= 1:
+            _init_worker()
+            for offset, rows in chunks:
+                write(offset + len(rows), score_chunk(offset, rows))
+        else:
+            # Results are written in submission order; at most 2 chunks per
+            # worker are in flight, which bounds memory
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                for offset, rows in chunks:
+                    pending.append((offset + len(rows), pool.submit(score_chunk, offset, rows)))
+                    if len(pending) >= 2 * workers:
+                        end, future = pending.popleft()
+                        write(end, future.result())
+                while pending:
+                    end, future = pending.popleft()
+                    write(end, future.result())
+
+    # Finished: the next run starts from the top again
+    if os.path.exists(checkpoint_path(output_path)):
+        os.remove(checkpoint_path(output_path))
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a symptom CSV / JSONL file with the ensemble")
+    parser.add_argument('input', help="CSV shaped like data/dataset.csv, or JSONL")
+    parser.add_argument('output', help="predictions file, .csv or .jsonl")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes (default: all CPUs)")
+    parser.add_argument('--start', type=int, default=None, help="input row to start from (overrides the checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="ignore an existing checkpoint")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n = score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                   resume=not args.restart, start=args.start, verbose=not args.quiet)
+    print(f"Wrote {n} rows to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def symptom_key(indices, use_proba=False):
+    """Canonical cache key: the symptom column indices as one 131-bit int."""
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return (mask, bool(use_proba))
+
+
+class SqliteBackend:
+    """
+    Optional second-level cache in a local SQLite file, shared by every
+    process (e.g. gunicorn workers) that points at the same path.
+    Rows are tagged with the model version, so a retrain never serves
+    stale entries to a worker that has already reloaded. The table keeps
+    at most max_rows entries, dropping the oldest writes first.
+    The cache is best effort: a locked or broken file is logged and
+    treated as a miss or a skipped write, never as a failed prediction.
+    """
+
+    def __init__(self, path, max_rows=65536, timeout=0.1):
+        self.path = path
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "version TEXT, key TEXT, value TEXT, PRIMARY KEY (version, key))"
+        )
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections must not cross threads or fork boundaries
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, version, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM predictions WHERE version = ? AND key = ?",
+                (version, _key_str(key))
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Shared prediction cache read failed: %s", e)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set_many(self, version, items):
+        """Write (key, value) pairs in one transaction, then trim the table to max_rows."""
+        try:
+            conn = self._conn()
+            with conn:
+                # REPLACE gives a rewritten row a new rowid, so rowid order is write order
+                conn.executemany(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                    [(version, _key_str(key), json.dumps(value)) for key, value in items]
+                )
+                conn.execute(
+                    "DELETE FROM predictions WHERE rowid <= (SELECT MAX(rowid) FROM predictions) - ?",
+                    (self.max_rows,)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Shared prediction cache write failed: %s", e)
+
+    def clear(self, keep_version=None):
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM predictions WHERE version != ?", (keep_version or '',))
+        except sqlite3.Error as e:
+            logger.warning("Shared prediction cache clear failed: %s", e)
+
+
+def version_tag(version):
+    """Short stable tag for a model registry version (its file signature)."""
+    return hashlib.sha1(repr(version).encode()).hexdigest()[:16]
+
+
+def _key_str(key):
+    mask, use_proba = key
+    return f"{mask:x}:{int(use_proba)}"
+
+
+class PredictionCache:
+    """
+    Bounded LRU (+ optional TTL) cache of model outputs keyed by symptom_key().
+    Only model-dependent fields are cached; per-request fields such as the
+    entered symptoms are filled in by the caller.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.version = ''
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+        if self.backend is not None:
+            tag = self.version
+            value = self.backend.get(tag, key)
+            if value is not None:
+                self._store(key, value, tag)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, version=None):
+        self.set_many([(key, value)], version)
+
+    def set_many(self, items, version=None):
+        """
+        Store (key, value) pairs; the shared backend gets them in one write.
+        version is that of the models that computed them; if a reload has
+        invalidated the cache since, they are dropped.
+        """
+        tag = self.version if version is None else version_tag(version)
+        stored = [(key, value) for key, value in items if self._store(key, value, tag)]
+        if stored and self.backend is not None:
+            self.backend.set_many(tag, stored)
+
+    def _store(self, key, value, tag=None):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if tag is not None and tag != self.version:
+                return False
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, version=''):
+        """Drop every entry; called when the model registry swaps bundles."""
+        with self._lock:
+            self._data.clear()
+            self.version = version_tag(version)
+        if self.backend is not None:
+            self.backend.clear(keep_version=self.version)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                'shared_backend': self.backend.path if self.backend is not None else None,
+            }
+
+
+def _cache_from_env():
+    ttl = float(os.environ.get('MEDIPREDICT_CACHE_TTL', 0)) or None
+    path = os.environ.get('MEDIPREDICT_CACHE_PATH')
+    max_rows = int(os.environ.get('MEDIPREDICT_CACHE_SHARED_SIZE', 65536))
+    return PredictionCache(
+        maxsize=int(os.environ.get('MEDIPREDICT_CACHE_SIZE', 4096)),
+        ttl=ttl,
+        backend=SqliteBackend(path, max_rows=max_rows) if path else None
+    )
+
+
+_cache = _cache_from_env()
+
+
+def get_prediction_cache():
+    return _cache
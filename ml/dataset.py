@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Binary training matrix built from data/Training.csv:
+#   X.npy      uint8 N x n_symptoms, 0/1
+#   y.npy      int16 N, index into meta['classes']
+#   meta.json  symptom and class vocabularies, plus the source CSV's
+#              sha256, size and mtime so it is rebuilt only when the CSV changes.
+#              preprocess_data.py --no-csv records data/dataset.csv as the
+#              source instead; such a binary is never rebuilt from Training.csv.
+TRAINING_CSV = 'data/Training.csv'
+BINARY_DIR = 'data/training'
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_meta(csv_path):
+    st = os.stat(csv_path)
+    return {
+        'source': csv_path,
+        'source_sha256': file_sha256(csv_path),
+        'source_size': st.st_size,
+        'source_mtime_ns': st.st_mtime_ns,
+    }
+
+
+class BinaryDatasetWriter:
+    """
+    Streams row blocks into the binary layout.
+    The row count and vocabularies must be known up front so X can be
+    preallocated on disk and filled chunk by chunk without holding it in RAM.
+    """
+
+    def __init__(self, path, n_rows, symptoms, classes, extra_meta=None):
+        os.makedirs(path, exist_ok=True)
+        # Drop the old marker first so a crash mid-write is never read as valid
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            os.remove(os.path.join(path, 'meta.json'))
+        self.path = path
+        self.X = np.lib.format.open_memmap(
+            os.path.join(path, 'X.npy'), mode='w+', dtype=np.uint8,
+            shape=(n_rows, len(symptoms)))
+        self.y = np.lib.format.open_memmap(
+            os.path.join(path, 'y.npy'), mode='w+', dtype=np.int16, shape=(n_rows,))
+        self.meta = {'symptoms': list(symptoms), 'classes': list(classes),
+                     'n_rows': int(n_rows), **(extra_meta or {})}
+        self.offset = 0
+
+    def write(self, X_block, y_block):
+        end = self.offset + len(X_block)
+        self.X[self.offset:end] = X_block
+        self.y[self.offset:end] = y_block
+        self.offset = end
+
+    def close(self, extra_meta=None):
+        self.X.flush()
+        self.y.flush()
+        del self.X, self.y
+        self.meta.update(extra_meta or {})
+        # meta.json goes last: its presence marks a complete artifact
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+
+class TrainingData:
+    """Memory-mapped training matrix plus its vocabularies."""
+
+    def __init__(self, X, y, symptoms, classes, meta):
+        self.X = X
+        self.y = y
+        self.symptoms = symptoms
+        self.classes = classes
+        self.meta = meta
+
+    def features(self, cols):
+        """X with columns in cols order; no copy when the order already matches."""
+        if list(cols) == self.symptoms:
+            return self.X
+        index = {s: i for i, s in enumerate(self.symptoms)}
+        return self.X[:, [index[c] for c in cols]]
+
+    def sparse_features(self, cols=None, chunksize=65536):
+        """
+        features() as a CSR matrix, built block by block from the memory map
+        so the dense matrix is never materialized as floats.
+        """
+        X = self.X if cols is None else self.features(cols)
+        blocks = [sparse.csr_matrix(X[start:start + chunksize], dtype=np.float32)
+                  for start in range(0, X.shape[0], chunksize)]
+        if not blocks:
+            return sparse.csr_matrix(X.shape, dtype=np.float32)
+        return sparse.vstack(blocks, format='csr')
+
+    def labels(self):
+        """Class names per row, as the LabelEncoder would see them."""
+        return np.asarray(self.classes, dtype=object)[self.y]
+
+
+def build_from_csv(csv_path=TRAINING_CSV, out_dir=BINARY_DIR, chunksize=50000):
+    """Convert the wide 0/1 Training CSV into the binary layout, chunk by chunk."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    symptoms = [c for c in header if c != 'prognosis']
+    classes, n_rows = set(), 0
+    for chunk in pd.read_csv(csv_path, usecols=['prognosis'], chunksize=chunksize):
+        classes.update(chunk['prognosis'].unique())
+        n_rows += len(chunk)
+    classes = sorted(classes)
+    class_index = pd.Series(np.arange(len(classes), dtype=np.int16), index=classes)
+
+    writer = BinaryDatasetWriter(out_dir, n_rows, symptoms, classes)
+    dtypes = {s: np.uint8 for s in symptoms}
+    for chunk in pd.read_csv(csv_path, dtype=dtypes, chunksize=chunksize):
+        writer.write(chunk[symptoms].to_numpy(), class_index[chunk['prognosis']].to_numpy())
+    writer.close(source_meta(csv_path))
+
+
+def _source_unchanged(meta, meta_path, path):
+    if not os.path.exists(path):
+        # Binary-only setups use what is there
+        return True
+    st = os.stat(path)
+    if meta.get('source_size') == st.st_size and meta.get('source_mtime_ns') == st.st_mtime_ns:
+        return True
+    # Touched but maybe not changed: fall back to the content hash
+    if meta.get('source_sha256') != file_sha256(path):
+        return False
+    meta.update(source_size=st.st_size, source_mtime_ns=st.st_mtime_ns)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return True
+
+
+def _is_current(meta, meta_path, csv_path):
+    source = meta.get('source')
+    if source is None:
+        # No recorded source: nothing to compare against
+        return True
+    if os.path.normpath(source) == os.path.normpath(csv_path):
+        return _source_unchanged(meta, meta_path, csv_path)
+    # Written straight from data/dataset.csv (preprocess_data.py --no-csv):
+    # csv_path may be older than it, so never rebuild from csv_path
+    if not _source_unchanged(meta, meta_path, source):
+        raise RuntimeError(f"{source} changed since {os.path.dirname(meta_path)}/ was built; "
+                           f"rerun preprocess_data.py")
+    return True
+
+
+def load_training_data(csv_path=TRAINING_CSV, out_dir=BINARY_DIR, mmap_mode='r'):
+    """
+    Memory-map the binary training matrix, rebuilding it first if the
+    source CSV's hash no longer matches. A binary written from
+    data/dataset.csv raises RuntimeError once that file has changed.
+    """
+    meta_path = os.path.join(out_dir, 'meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or not _is_current(meta, meta_path, csv_path):
+        build_from_csv(csv_path, out_dir)
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    X = np.load(os.path.join(out_dir, 'X.npy'), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(out_dir, 'y.npy'), mmap_mode=mmap_mode)
+    return TrainingData(X, y, meta['symptoms'], meta['classes'], meta)
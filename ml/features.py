@@ -0,0 +1,82 @@
+import numpy as np
+from scipy import sparse
+
+
+def normalize_symptom(symptom):
+    """'Skin Rash ' -> 'skin_rash' (the form used by the model columns)."""
+    return symptom.strip().lower().replace(' ', '_')
+
+
+def display_symptom(column):
+    """'skin_rash' -> 'Skin Rash' (the form shown in the UI)."""
+    return column.replace('_', ' ').title()
+
+
+def display_symptoms(cols):
+    return sorted([display_symptom(s) for s in cols])
+
+
+class SymptomEncoder:
+    """
+    Precompiled symptom -> column index map for one symptom_columns list.
+    Encodes straight into NumPy arrays; no DataFrame is involved.
+    """
+
+    def __init__(self, cols, dtype=np.float32):
+        self.cols = list(cols)
+        self.n_features = len(self.cols)
+        self.dtype = dtype
+        self.index = {name: i for i, name in enumerate(self.cols)}
+
+    def indices(self, symptoms_list):
+        """Sorted, de-duplicated column indices of the known symptoms."""
+        idx = set()
+        for symptom in symptoms_list:
+            i = self.index.get(normalize_symptom(symptom))
+            if i is not None:
+                idx.add(i)
+        return sorted(idx)
+
+    def encode(self, symptoms_list, out=None):
+        """Return a 1 x n_features row; pass out= to reuse a buffer."""
+        if out is None:
+            out = np.zeros((1, self.n_features), dtype=self.dtype)
+        else:
+            out.fill(0)
+        out[0, self.indices(symptoms_list)] = 1
+        return out
+
+    def encode_batch(self, list_of_symptom_lists):
+        """Return an N x n_features matrix in one scatter."""
+        return self.matrix_from_indices([self.indices(s) for s in list_of_symptom_lists])
+
+    def matrix_from_indices(self, list_of_index_lists):
+        rows, cols = [], []
+        for r, idx in enumerate(list_of_index_lists):
+            rows.extend([r] * len(idx))
+            cols.extend(idx)
+        X = np.zeros((len(list_of_index_lists), self.n_features), dtype=self.dtype)
+        X[rows, cols] = 1
+        return X
+
+    def csr_from_indices(self, list_of_index_lists):
+        """
+        The same matrix as matrix_from_indices, as CSR: memory grows with
+        the number of active symptoms (3-10 per row), not with 131 columns.
+        """
+        lengths = np.fromiter((len(idx) for idx in list_of_index_lists),
+                              dtype=np.int64, count=len(list_of_index_lists))
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter((i for idx in list_of_index_lists for i in idx),
+                              dtype=np.int32, count=int(indptr[-1]))
+        data = np.ones(len(indices), dtype=self.dtype)
+        return sparse.csr_matrix((data, indices, indptr),
+                                 shape=(len(lengths), self.n_features))
+
+
+def dense_chunks(X, chunk_size=4096):
+    """Yield dense row blocks of X (dense or sparse) without densifying all of it."""
+    for start in range(0, X.shape[0], chunk_size):
+        block = X[start:start + chunk_size]
+        yield block.toarray() if sparse.issparse(block) else block
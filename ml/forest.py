@@ -0,0 +1,136 @@
+import os
+import joblib
+import numpy as np
+import sklearn
+from ml.features import dense_chunks
+
+# Before 1.4, DecisionTreeClassifier.predict_proba normalised tree_.value
+# (raw weighted counts) itself; from 1.4 on tree_.value already holds
+# the fractions and predict_proba returns it unchanged.
+_NORMALIZE_LEAVES = tuple(int(v) for v in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes')
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous node arrays.
+    All trees share one node table; child pointers are global indices and
+    leaves point to themselves, so a chunk of rows walks all trees at once
+    in max_depth vectorized steps.
+    """
+
+    # Rows per inference chunk; keeps the N x T node arrays cache-resident
+    chunk_size = 128
+    accepts_sparse = True
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 classes=None, child=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_estimators = len(roots)
+        self.n_classes = value.shape[1]
+        # rf.classes_, so the sklearn forest need not be loaded to name columns
+        self.classes = classes if classes is not None else np.arange(self.n_classes)
+        # child[2 * node + went_right] is the next node; saved with the
+        # other arrays so a memory-mapped forest does not rebuild it
+        self._child = child if child is not None else np.stack([left, right], axis=1).ravel()
+
+    def _apply_chunk(self, X):
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_base + self.feature.take(node))
+            node = self._child.take(2 * node + (x > self.threshold.take(node)))
+        return node
+
+    def _chunks(self, X):
+        # Sparse input is densified a few thousand rows at a time
+        for block in dense_chunks(X):
+            block = np.ascontiguousarray(block)
+            for i in range(0, block.shape[0], self.chunk_size):
+                yield block[i:i + self.chunk_size]
+
+    def apply(self, X):
+        """Global leaf index reached by each row in each tree, shape N x T."""
+        return np.concatenate([
+            self._apply_chunk(block) for block in self._chunks(X)
+        ]) if X.shape[0] else np.empty((0, self.n_estimators), dtype=np.intp)
+
+    def predict_proba(self, X):
+        """
+        Same result as RandomForestClassifier.predict_proba, bit for bit
+        when the forest runs with n_jobs=1: tree outputs are summed in
+        estimator order and divided by the number of trees.
+        X may be dense or scipy.sparse.
+        """
+        proba = np.zeros((X.shape[0], self.n_classes), dtype=np.float64)
+        for i, block in zip(range(0, X.shape[0], self.chunk_size), self._chunks(X)):
+            leaves = self._apply_chunk(block)
+            out = proba[i:i + self.chunk_size]
+            for t in range(self.n_estimators):
+                out += self.value.take(leaves[:, t], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def save(self, path):
+        """Uncompressed joblib file whose arrays load(mmap_mode=...) can map."""
+        tmp = f"{path}.tmp{os.getpid()}"
+        joblib.dump({'max_depth': self.max_depth, 'child': self._child,
+                     **{name: getattr(self, name) for name in FOREST_ARRAYS}}, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        mmap_mode='r' (or 'c') maps the node arrays from the page cache
+        instead of reading them into this process, so every process that
+        loads the same file shares one copy.
+        """
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
+
+
+def flatten_forest(rf):
+    """Export a fitted RandomForestClassifier as a CompiledForest."""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in rf.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        ids = np.arange(offset, offset + n)
+
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, ids, tree.children_right + offset))
+
+        leaf_value = tree.value[:, 0, :rf.n_classes_].astype(np.float64)
+        if _NORMALIZE_LEAVES:
+            normalizer = leaf_value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            leaf_value = leaf_value / normalizer
+        value.append(leaf_value)
+
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.concatenate(feature).astype(np.intp),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        left=np.concatenate(left).astype(np.intp),
+        right=np.concatenate(right).astype(np.intp),
+        value=np.ascontiguousarray(np.concatenate(value)),
+        roots=np.asarray(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=np.asarray(rf.classes_),
+    )
@@ -1,68 +1,253 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import hashlib
+import io
 import joblib
+import json
 import os
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report, roc_curve, auc
-from sklearn.preprocessing import label_binarize
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, confusion_matrix
+from ml.registry import get_models
+from ml.dataset import load_training_data
+from ml.train_model import SPLIT, SVM_KINDS, make_svm
+from ml.svm import compile_svm
+from ml.predict import call_model
 
-def evaluate_models():
-    # Ensure image directory exists
-    if not os.path.exists('static/img/evaluation'):
-        os.makedirs('static/img/evaluation')
+EVAL_DIR = 'static/img/evaluation'
+METRICS_FILE = os.path.join('models', 'evaluation_metrics.json')
+
+
+def predictions_digest(y_true, y_pred, class_names):
+    """Identifies one model's predictions; its plot is redrawn only when this changes."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(y_true, dtype=np.int64).data)
+    digest.update(np.ascontiguousarray(y_pred, dtype=np.int64).data)
+    digest.update(json.dumps(list(map(str, class_names))).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def metrics_from_confusion(cm):
+    """Accuracy and per-class / averaged precision, recall and F1 from one confusion matrix."""
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    weights = support / support.sum()
+    return {
+        'accuracy': float(tp.sum() / cm.sum()),
+        'precision': precision, 'recall': recall, 'f1': f1, 'support': support,
+        'macro avg': [float(precision.mean()), float(recall.mean()), float(f1.mean())],
+        'weighted avg': [float(precision @ weights), float(recall @ weights), float(f1 @ weights)],
+    }
+
+
+def evaluate_one(name, model, X, y_true, n_classes):
+    """One prediction pass; every metric is derived from its confusion matrix."""
+    start = time.perf_counter()
+    y_pred = np.asarray(call_model(model, 'predict', X))
+    predict_s = time.perf_counter() - start
+    cm = confusion_matrix(y_true, y_pred, labels=np.arange(n_classes))
+    return name, y_pred, cm, predict_s
+
+
+def format_report(metrics, class_names):
+    """Text report in the layout of sklearn's classification_report."""
+    width = max(len(str(c)) for c in list(class_names) + ['weighted avg'])
+    lines = [f"{'':>{width}}  {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for i, label in enumerate(class_names):
+        lines.append(f"{label:>{width}}  {metrics['precision'][i]:>9.2f} {metrics['recall'][i]:>9.2f} "
+                     f"{metrics['f1'][i]:>9.2f} {int(metrics['support'][i]):>9}")
+    total = int(metrics['support'].sum())
+    lines += ["", f"{'accuracy':>{width}}  {'':>9} {'':>9} {metrics['accuracy']:>9.2f} {total:>9}"]
+    for avg in ('macro avg', 'weighted avg'):
+        p, r, f = metrics[avg]
+        lines.append(f"{avg:>{width}}  {p:>9.2f} {r:>9.2f} {f:>9.2f} {total:>9}")
+    return "\n".join(lines)
+
+
+def plot_confusion(cm, class_names, name, path):
+    # Imported here so --no-plots runs never load matplotlib
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
+                xticklabels=class_names, yticklabels=class_names)
+    plt.title(f'Confusion Matrix: {name}')
+    plt.ylabel('Actual')
+    plt.xlabel('Predicted')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def load_metrics():
+    if os.path.exists(METRICS_FILE):
+        with open(METRICS_FILE) as f:
+            return json.load(f)
+    return {}
+
+
+def evaluate_models(sparse_input=False, plots=True, max_workers=None, verbose=True):
+    """
+    Score all three models in parallel (one predict pass each), save the
+    metrics to METRICS_FILE and redraw a confusion-matrix PNG only when
+    that model's predictions differ from the last run.
+    """
+    timings = {}
+    total_start = time.perf_counter()
 
     # Load data
-    df_test = pd.read_csv('data/Training.csv') # Using Training for placeholder testing
-    df_test = df_test.dropna(axis=1)
-    
+    data = load_training_data() # Using Training for placeholder testing
+
     # Load models
-    rf = joblib.load('models/random_forest_model.pkl')
-    nb = joblib.load('models/naive_bayes_model.pkl')
-    svm = joblib.load('models/svm_model.pkl')
-    le = joblib.load('models/label_encoder.pkl')
-    cols = joblib.load('models/symptom_columns.pkl')
-    
-    X_test = df_test[cols]
-    y_test = le.transform(df_test['prognosis'])
-    
+    rf, nb, svm, le, cols = get_models().as_tuple()
+
+    X_test = data.sparse_features(cols) if sparse_input else data.features(cols)
+    y_test = le.transform(data.labels())
+    class_names = list(le.classes_)
+
     models = {
         'Random Forest': rf,
         'Naive Bayes': nb,
         'SVM': svm
     }
-    
+
+    # The heavy parts (forest walk, libsvm, BLAS) mostly run outside the GIL
+    with ThreadPoolExecutor(max_workers=max_workers or len(models)) as pool:
+        outputs = list(pool.map(
+            lambda item: evaluate_one(item[0], item[1], X_test, y_test, len(class_names)),
+            models.items()))
+
+    previous = load_metrics().get('models', {})
     results = {}
-    
-    for name, model in models.items():
-        y_pred = model.predict(X_test)
-        acc = accuracy_score(y_test, y_pred)
-        results[name] = acc
-        
-        # Confusion Matrix
-        cm = confusion_matrix(y_test, y_pred)
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
-                    xticklabels=le.classes_, yticklabels=le.classes_)
-        plt.title(f'Confusion Matrix: {name}')
-        plt.ylabel('Actual')
-        plt.xlabel('Predicted')
-        plt.tight_layout()
-        plt.savefig(f'static/img/evaluation/{name.lower().replace(" ", "_")}_cm.png')
-        plt.close()
-
-        # Print report
-        print(f"\n--- {name} Classification Report ---")
-        print(classification_report(y_test, y_pred, target_names=le.classes_))
+    to_plot = []
+    for name, y_pred, cm, predict_s in outputs:
+        timings[f'predict {name}'] = predict_s
+        metrics = metrics_from_confusion(cm)
+        digest = predictions_digest(y_test, y_pred, class_names)
+        plot_path = os.path.join(EVAL_DIR, f'{name.lower().replace(" ", "_")}_cm.png')
+
+        if plots and (previous.get(name, {}).get('predictions_sha256') != digest
+                      or not os.path.exists(plot_path)):
+            to_plot.append((cm, class_names, name, plot_path))
+
+        if verbose:
+            print(f"\n--- {name} Classification Report ---")
+            print(format_report(metrics, class_names))
+
+        results[name] = {
+            'accuracy': metrics['accuracy'],
+            'macro_avg': dict(zip(('precision', 'recall', 'f1'), metrics['macro avg'])),
+            'weighted_avg': dict(zip(('precision', 'recall', 'f1'), metrics['weighted avg'])),
+            'per_class': {
+                label: {'precision': float(metrics['precision'][i]), 'recall': float(metrics['recall'][i]),
+                        'f1': float(metrics['f1'][i]), 'support': int(metrics['support'][i])}
+                for i, label in enumerate(class_names)
+            },
+            'confusion_matrix': cm.tolist(),
+            'predictions_sha256': digest,
+        }
+
+    # Heatmaps are pure-Python matplotlib work: render changed ones in processes
+    if to_plot:
+        os.makedirs(EVAL_DIR, exist_ok=True)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(len(to_plot), os.cpu_count() or 1)) as pool:
+            list(pool.map(plot_confusion, *zip(*to_plot)))
+        timings[f'plot {len(to_plot)} confusion matrices'] = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
+    tmp = f"{METRICS_FILE}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump({'n_rows': int(len(y_test)), 'classes': class_names, 'models': results}, f, indent=2)
+    os.replace(tmp, METRICS_FILE)
+    timings['total'] = time.perf_counter() - total_start
 
     # Summary Table
     print("\nModel Summary:")
     print("-" * 38)
     print(f"{'Model':<20} | {'Accuracy':<10}")
     print("-" * 38)
-    for name, acc in results.items():
-        print(f"{name:<20} | {acc:.4%}")
+    for name, entry in results.items():
+        print(f"{name:<20} | {entry['accuracy']:.4%}")
     print("-" * 38)
+    for stage, seconds in timings.items():
+        print(f"  {stage:<28} {seconds:8.2f}s")
+    return results
+
+def compare_svm_variants(kinds=SVM_KINDS, repeat=200):
+    """
+    Fit every SVM variant on the training split and report the
+    accuracy / latency / size tradeoff, to pick the production SVM.
+    """
+    data = load_training_data()
+    y = pd.factorize(data.labels(), sort=True)[0]
+    X_train, X_test, y_train, y_test = train_test_split(data.X, y, **SPLIT)
+    X_test = np.asarray(X_test, dtype=np.float64)
+
+    rows = []
+    for kind in kinds:
+        model = make_svm(kind)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_s = time.perf_counter() - start
+        # What train_model saves; must agree with the sklearn probabilities
+        compiled = compile_svm(model)
+        if compiled is not model:
+            assert np.allclose(compiled.predict_proba(X_test), model.predict_proba(X_test))
+            model = compiled
+        acc = accuracy_score(y_test, model.predict(X_test))
+
+        # Single-row latency, the /predict hot path
+        one = X_test[:1]
+        model.predict_proba(one)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model.predict_proba(one)
+        row_ms = (time.perf_counter() - start) / repeat * 1000
+
+        start = time.perf_counter()
+        model.predict_proba(X_test)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        rows.append((kind, acc, fit_s, row_ms, batch_ms, len(buffer.getvalue()) / 1024))
+
+    print("\nSVM Variant Tradeoff:")
+    print("-" * 78)
+    print(f"{'Variant':<10} | {'Accuracy':<9} | {'Fit s':>6} | {'1-row ms':>8} | "
+          f"{f'{len(X_test)}-row ms':>11} | {'Size KB':>8}")
+    print("-" * 78)
+    for kind, acc, fit_s, row_ms, batch_ms, size_kb in rows:
+        print(f"{kind:<10} | {acc:<9.4%} | {fit_s:>6.2f} | {row_ms:>8.3f} | "
+              f"{batch_ms:>11.2f} | {size_kb:>8.1f}")
+    print("-" * 78)
+    print("Train a variant with: python -m ml.train_model --svm <variant>")
+    return rows
 
 if __name__ == "__main__":
-    evaluate_models()
+    parser = argparse.ArgumentParser(description="Evaluate the trained models")
+    parser.add_argument('--svm-tradeoff', action='store_true',
+                        help="compare SVM variants on accuracy, latency and size")
+    parser.add_argument('--sparse', action='store_true',
+                        help="score the models on a CSR matrix instead of the dense one")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="headless run: metrics JSON only, no confusion-matrix PNGs")
+    parser.add_argument('--quiet', action='store_true', help="skip the per-class reports")
+    parser.add_argument('--workers', type=int, default=None, help="models scored in parallel")
+    args = parser.parse_args()
+    if args.svm_tradeoff:
+        compare_svm_variants()
+    else:
+        evaluate_models(sparse_input=args.sparse, plots=not args.no_plots,
+                        max_workers=args.workers, verbose=not args.quiet)
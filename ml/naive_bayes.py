@@ -0,0 +1,108 @@
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+
+class BinaryNaiveBayes(ClassifierMixin, BaseEstimator):
+    """
+    Bernoulli Naive Bayes for 0/1 symptom vectors (same model as sklearn's
+    BernoulliNB with Laplace smoothing alpha).
+
+    Fitting only accumulates per-class counts; from them two log tables are
+    precomputed:
+        absent_base_[c]     log P(c) + sum_j log(1 - p_cj)
+        present_delta_[j,c] log p_cj - log(1 - p_cj)
+    so a row's joint log-likelihood is absent_base_ plus the present_delta_
+    rows of its active symptoms only. partial_fit adds more counts and
+    rebuilds the tables, so newly labeled cases never need a full refit.
+    """
+
+    accepts_sparse = True
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def fit(self, X, y):
+        for attr in ('classes_', 'class_count_', 'feature_count_'):
+            if hasattr(self, attr):
+                delattr(self, attr)
+        return self.partial_fit(X, y, classes=np.unique(y))
+
+    def partial_fit(self, X, y, classes=None):
+        """Add labeled rows. classes is required on the first call only."""
+        if not sparse.issparse(X):
+            X = np.asarray(X)
+        y = np.asarray(y)
+        if not hasattr(self, 'classes_'):
+            if classes is None:
+                raise ValueError("classes must be passed on the first call to partial_fit")
+            self.classes_ = np.asarray(classes)
+            self.n_features_in_ = X.shape[1]
+            self.class_count_ = np.zeros(len(self.classes_))
+            self.feature_count_ = np.zeros((len(self.classes_), self.n_features_in_))
+        elif X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+
+        class_pos = np.searchsorted(self.classes_, y)
+        class_pos = np.minimum(class_pos, len(self.classes_) - 1)
+        if not np.array_equal(self.classes_[class_pos], y):
+            unknown = sorted(set(y.tolist()) - set(self.classes_.tolist()))
+            raise ValueError(f"Labels not seen in the first partial_fit: {unknown}")
+
+        np.add.at(self.class_count_, class_pos, 1)
+        # One-hot(class).T @ X sums the 0/1 rows per class; O(nnz) for CSR X
+        onehot = sparse.csr_matrix(
+            (np.ones(len(y)), (np.arange(len(y)), class_pos)),
+            shape=(len(y), len(self.classes_)))
+        counts = onehot.T @ (X != 0).astype(np.float64)
+        self.feature_count_ += counts.toarray() if sparse.issparse(counts) else counts
+        self._update_tables()
+        return self
+
+    def _update_tables(self):
+        smoothed_cc = (self.class_count_ + 2 * self.alpha)[:, np.newaxis]
+        log_present = np.log(self.feature_count_ + self.alpha) - np.log(smoothed_cc)
+        log_absent = np.log(smoothed_cc - self.feature_count_ - self.alpha) - np.log(smoothed_cc)
+        with np.errstate(divide='ignore'):
+            class_log_prior = np.log(self.class_count_) - np.log(self.class_count_.sum())
+        self.absent_base_ = class_log_prior + log_absent.sum(axis=1)
+        self.present_delta_ = np.ascontiguousarray((log_present - log_absent).T)
+
+    def joint_log_likelihood_indices(self, list_of_index_lists):
+        """N x C log-likelihoods from each row's active column indices."""
+        jll = np.repeat(self.absent_base_[np.newaxis, :], len(list_of_index_lists), axis=0)
+        for r, idx in enumerate(list_of_index_lists):
+            if len(idx):
+                jll[r] += self.present_delta_[idx].sum(axis=0)
+        return jll
+
+    def joint_log_likelihood(self, X, chunk_size=4096):
+        # X is 0/1, so X @ present_delta_ adds exactly the active rows;
+        # for CSR the product only touches the stored entries
+        if sparse.issparse(X):
+            jll = np.asarray(X @ self.present_delta_)
+        else:
+            # Dense rows are upcast to float64 a chunk at a time, not all at once
+            X = np.asarray(X)
+            jll = np.empty((X.shape[0], len(self.classes_)))
+            for start in range(0, X.shape[0], chunk_size):
+                np.matmul(X[start:start + chunk_size], self.present_delta_,
+                          out=jll[start:start + chunk_size])
+        jll += self.absent_base_
+        return jll
+
+    @staticmethod
+    def _softmax(jll):
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        return jll
+
+    def predict_proba(self, X):
+        return self._softmax(self.joint_log_likelihood(X))
+
+    def predict(self, X):
+        return self.classes_[self.joint_log_likelihood(X).argmax(axis=1)]
+
+    def predict_proba_indices(self, list_of_index_lists):
+        return self._softmax(self.joint_log_likelihood_indices(list_of_index_lists))
@@ -1,101 +1,139 @@
-import joblib
-import pandas as pd
-import numpy as np
 import os
+import numpy as np
+from scipy import sparse
+from ml.features import dense_chunks
+from ml.cache import get_prediction_cache, symptom_key
+from ml.registry import get_models, get_registry
+from ml.reference import get_reference_data
+from ml.timing import timer
+
+TOP_K = 3
+# Severity score bands: below 7 LOW, 7-12 MODERATE, 13 and up HIGH.
+# MEDIPREDICT_RISK_THRESHOLDS="7,13" moves the cut-offs.
+RISK_LEVELS = (("LOW 🟢", "success"), ("MODERATE 🔶", "warning"), ("HIGH ⚠️", "danger"))
+RISK_THRESHOLDS = tuple(
+    float(t) for t in os.environ.get('MEDIPREDICT_RISK_THRESHOLDS', '7,13').split(',')
+)
+if len(RISK_THRESHOLDS) != len(RISK_LEVELS) - 1 or list(RISK_THRESHOLDS) != sorted(RISK_THRESHOLDS):
+    raise ValueError(f"MEDIPREDICT_RISK_THRESHOLDS needs {len(RISK_LEVELS) - 1} ascending values, "
+                     f"got {RISK_THRESHOLDS}")
+# Batches of at least this many rows (cached or not) are encoded as CSR;
+# the whole batch is encoded once for its severity scores
+SPARSE_MIN_ROWS = 256
+
+# Cached model outputs are dropped whenever the registry loads new models
+_cache = get_prediction_cache()
+get_registry().add_listener(lambda bundle: _cache.invalidate(bundle.version))
 
 def load_models():
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    models_path = os.path.join(base_path, 'models')
-    
-    rf = joblib.load(os.path.join(models_path, 'random_forest_model.pkl'))
-    nb = joblib.load(os.path.join(models_path, 'naive_bayes_model.pkl'))
-    svm = joblib.load(os.path.join(models_path, 'svm_model.pkl'))
-    le = joblib.load(os.path.join(models_path, 'label_encoder.pkl'))
-    cols = joblib.load(os.path.join(models_path, 'symptom_columns.pkl'))
-    return rf, nb, svm, le, cols
-
-def predict_disease(symptoms_list):
+    """Return (rf, nb, svm, le, cols) from the process-wide model registry."""
+    return get_models().as_tuple()
+
+def top_k_indices(proba, k=TOP_K):
     """
-    symptoms_list: list of symptom strings
-    e.g. ['itching', 'skin_rash', 'fever']
-    Returns: dict with predictions from all 3 models
+    Row-wise top-k class indices of an N x C probability matrix,
+    highest first. argpartition keeps this O(C) per row.
+    """
+    k = min(k, proba.shape[1])
+    part = np.argpartition(proba, -k, axis=1)[:, -k:]
+    part_proba = np.take_along_axis(proba, part, axis=1)
+    order = np.argsort(-part_proba, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+def class_proba(proba, rows, columns):
+    """proba[rows, columns], with 0 where a column is -1 (class unknown to the model)."""
+    return np.where(columns >= 0, proba[rows, columns], 0.0)
+
+def call_model(model, method, X):
+    """model.method(X); models without sparse support get X in dense chunks."""
+    fn = getattr(model, method)
+    if not sparse.issparse(X) or getattr(model, 'accepts_sparse', False):
+        return fn(X)
+    return np.concatenate([fn(block) for block in dense_chunks(X)])
+
+def evaluate_ensemble(models, X, use_proba=False):
     """
-    rf, nb, svm, le, cols = load_models()
-    
-    # Create input vector
-    input_vector = pd.DataFrame(
-        np.zeros((1, len(cols))), columns=cols)
-    
-    for symptom in symptoms_list:
-        symptom = symptom.strip().lower().replace(' ', '_')
-        if symptom in cols:
-            input_vector.at[0, symptom] = 1
-    
-    # Predictions from all 3 models
-    rf_pred = le.inverse_transform(rf.predict(input_vector))[0]
-    nb_pred = le.inverse_transform(nb.predict(input_vector))[0]
-    svm_pred = le.inverse_transform(svm.predict(input_vector))[0]
-    
-    # Confidence from RF
-    rf_proba = rf.predict_proba(input_vector)[0]
-    rf_confidence = round(max(rf_proba) * 100, 2)
-    
-    # Top 3 predictions with confidence
-    top3_idx = np.argsort(rf_proba)[-3:][::-1]
-    top3 = [(le.inverse_transform([i])[0], 
-             round(rf_proba[i]*100, 2)) for i in top3_idx]
-    
-    # Severity score
-    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    severity_df = pd.read_csv(os.path.join(base_path, 'data/symptom_severity.csv'))
-    severity_map = dict(zip(
-        severity_df['Symptom'].str.lower().str.replace(' ','_'),
-        severity_df['weight']
-    ))
-    severity_score = sum(
-        severity_map.get(s.lower().replace(' ','_'), 0)
-        for s in symptoms_list
-    )
-    
-    # Get description
-    desc_df = pd.read_csv(os.path.join(base_path, 'data/symptom_Description.csv'))
-    desc_row = desc_df[desc_df['Disease'] == rf_pred]
-    description = desc_row['Description'].values[0] \
-                  if len(desc_row) > 0 else "No description available."
-    
-    # Get precautions
-    prec_df = pd.read_csv(os.path.join(base_path, 'data/symptom_precaution.csv'))
-    prec_row = prec_df[prec_df['Disease'] == rf_pred]
-    precautions = []
-    if len(prec_row) > 0:
-        for i in range(1, 5):
-            col_name = f'Precaution_{i}'
-            if col_name in prec_row.columns:
-                p = prec_row[col_name].values[0]
-                if pd.notna(p):
-                    precautions.append(p)
-    
-    # Risk level based on severity score
-    if severity_score >= 13:
-        risk = "HIGH ⚠️"
-        risk_color = "danger"
-    elif severity_score >= 7:
-        risk = "MODERATE 🔶"
-        risk_color = "warning"
+    Single pass of the 3-model ensemble over an N x 131 matrix, dense or CSR.
+    The RF label, confidence and top-k all come from one predict_proba
+    call on the flattened forest (same output as rf.predict_proba).
+    With use_proba=True, NB and SVM labels come from their own
+    predict_proba too, so agreement can be weighted by confidence.
+    """
+    with timer('rf'):
+        rf_proba = models.forest.predict_proba(X)
+    rf_idx = rf_proba.argmax(axis=1)
+    out = {
+        'rf_proba': rf_proba,
+        'rf_pred': models.rf_names[rf_idx],
+        'top_idx': top_k_indices(rf_proba),
+    }
+    if use_proba:
+        with timer('nb'):
+            nb_proba = call_model(models.nb, 'predict_proba', X)
+        with timer('svm'):
+            svm_proba = call_model(models.svm, 'predict_proba', X)
+        rows = np.arange(X.shape[0])
+        out['nb_pred'] = models.nb_names[nb_proba.argmax(axis=1)]
+        out['svm_pred'] = models.svm_names[svm_proba.argmax(axis=1)]
+        # Mean probability the three models give the RF's pick, looked up
+        # in each model's own column order
+        out['weighted_agreement'] = (
+            rf_proba[rows, rf_idx]
+            + class_proba(nb_proba, rows, models.nb_columns[rf_idx])
+            + class_proba(svm_proba, rows, models.svm_columns[rf_idx])
+        ) / 3
     else:
-        risk = "LOW 🟢"
-        risk_color = "success"
-    
-    return {
+        with timer('nb'):
+            out['nb_pred'] = models.nb_names[call_model(models.nb, 'predict', X)]
+        with timer('svm'):
+            out['svm_pred'] = models.svm_names[call_model(models.svm, 'predict', X)]
+    return out
+
+def _model_outputs(ens, r, top3_names):
+    """The cacheable, model-dependent part of one row's result."""
+    rf_proba = ens['rf_proba'][r]
+    out = {
+        'rf_prediction': str(ens['rf_pred'][r]),
+        'nb_prediction': str(ens['nb_pred'][r]),
+        'svm_prediction': str(ens['svm_pred'][r]),
+        'confidence': round(float(rf_proba.max()) * 100, 2),
+        'top3_predictions': [
+            (str(name), round(float(rf_proba[i])*100, 2))
+            for name, i in zip(top3_names[r], ens['top_idx'][r])
+        ],
+    }
+    if 'weighted_agreement' in ens:
+        out['weighted_agreement'] = round(float(ens['weighted_agreement'][r]) * 100, 2)
+    return out
+
+def severity_scores(X, weights):
+    """Summed severity weight of each row of a 0/1 matrix (dense or CSR): one dot product."""
+    return np.asarray(X @ weights).ravel()
+
+def risk_bands(scores, thresholds=RISK_THRESHOLDS):
+    """Index into RISK_LEVELS for each score (a score equal to a threshold is in the band above)."""
+    return np.digitize(scores, thresholds)
+
+def _build_result(symptoms_list, outputs, ref, severity_score, band):
+    rf_pred = outputs['rf_prediction']
+    nb_pred = outputs['nb_prediction']
+    svm_pred = outputs['svm_prediction']
+
+    # Description and precautions from the in-memory index
+    description = ref.description(rf_pred)
+    precautions = ref.precautions_for(rf_pred)
+    risk, risk_color = RISK_LEVELS[band]
+
+    result = {
         'primary_prediction': rf_pred,
-        'confidence': rf_confidence,
-        'top3_predictions': top3,
+        'confidence': outputs['confidence'],
+        'top3_predictions': [tuple(t) for t in outputs['top3_predictions']],
         'rf_prediction': rf_pred,
         'nb_prediction': nb_pred,
         'svm_prediction': svm_pred,
         'description': description,
         'precautions': precautions,
-        'severity_score': severity_score,
+        'severity_score': int(severity_score),
         'risk_level': risk,
         'risk_color': risk_color,
         'symptoms_entered': symptoms_list,
@@ -105,3 +143,66 @@ def predict_disease(symptoms_list):
             nb_pred == svm_pred
         ])
     }
+    if 'weighted_agreement' in outputs:
+        result['weighted_agreement'] = outputs['weighted_agreement']
+    return result
+
+def predict_diseases_batch(list_of_symptom_lists, use_proba=False):
+    """
+    list_of_symptom_lists: list of symptom lists, one per patient
+    e.g. [['itching', 'skin_rash', 'fever'], ['cough', 'chills', 'fatigue']]
+    Returns: list of predict_disease() dicts, in input order
+    """
+    if not list_of_symptom_lists:
+        return []
+    models = get_models()
+    encoder = models.encoder
+    with timer('encode'):
+        indices = [encoder.indices(s) for s in list_of_symptom_lists]
+
+    # Serve repeated symptom sets from the cache; only misses hit the models
+    outputs = [None] * len(indices)
+    if _cache.enabled:
+        with timer('cache'):
+            keys = [symptom_key(idx, use_proba) for idx in indices]
+            outputs = [_cache.get(key) for key in keys]
+    missing = [r for r, out in enumerate(outputs) if out is None]
+
+    # One N x 131 matrix for the whole batch, CSR once it is large; it
+    # gives every row's severity, and its uncached rows go to the models
+    with timer('encode'):
+        if len(indices) >= SPARSE_MIN_ROWS:
+            X_all = encoder.csr_from_indices(indices)
+        else:
+            X_all = encoder.matrix_from_indices(indices)
+
+    if missing:
+        X = X_all if len(missing) == len(indices) else X_all[missing]
+
+        # Predictions from all 3 models, one call each
+        ens = evaluate_ensemble(models, X, use_proba=use_proba)
+        top3_names = models.rf_names[ens['top_idx']]
+        for j, r in enumerate(missing):
+            outputs[r] = _model_outputs(ens, j, top3_names)
+        if _cache.enabled:
+            # One write for the batch, tagged with the bundle that computed
+            # it, so a reload since get_models() drops it instead of caching
+            # stale output
+            _cache.set_many([(keys[r], outputs[r]) for r in missing], version=models.version)
+
+    with timer('reference'):
+        ref = get_reference_data()
+        severity = severity_scores(X_all, ref.severity_weights(models.cols))
+        bands = risk_bands(severity)
+        return [
+            _build_result(symptoms_list, out, ref, score, band)
+            for symptoms_list, out, score, band in zip(list_of_symptom_lists, outputs, severity, bands)
+        ]
+
+def predict_disease(symptoms_list, use_proba=False):
+    """
+    symptoms_list: list of symptom strings
+    e.g. ['itching', 'skin_rash', 'fever']
+    Returns: dict with predictions from all 3 models
+    """
+    return predict_diseases_batch([symptoms_list], use_proba=use_proba)[0]
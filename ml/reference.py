@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import os
+import threading
+import time
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_PATH, 'data')
+
+REFERENCE_FILES = {
+    'severity': 'symptom_severity.csv',
+    'description': 'symptom_Description.csv',
+    'precaution': 'symptom_precaution.csv',
+}
+
+NO_DESCRIPTION = "No description available."
+
+
+class ReferenceData:
+    """
+    Severity weights, descriptions and precautions as plain dict lookups.
+    Built once from the CSVs in data/ and never mutated afterwards (apart
+    from memoizing severity_weights).
+    """
+
+    def __init__(self, severity_map, descriptions, precautions, version):
+        self.severity_map = severity_map
+        self.descriptions = descriptions
+        self.precautions = precautions
+        self.version = version
+        self._weights = {}
+        # Ready-made rows for the /diseases catalog page
+        self.disease_records = [
+            {'Disease': d, 'Description': desc} for d, desc in descriptions.items()
+        ]
+
+    def description(self, disease):
+        return self.descriptions.get(disease, NO_DESCRIPTION)
+
+    def precautions_for(self, disease):
+        return list(self.precautions.get(disease, ()))
+
+    def severity(self, symptom):
+        return self.severity_map.get(symptom, 0)
+
+    def severity_weights(self, cols):
+        """
+        Severity weight of each model column, in column order, so the
+        severity scores of an N x len(cols) 0/1 matrix X are X @ weights.
+        Built once per column list.
+        """
+        key = tuple(cols)
+        weights = self._weights.get(key)
+        if weights is None:
+            weights = np.array([self.severity(c) for c in key], dtype=np.float64)
+            weights.flags.writeable = False
+            self._weights[key] = weights
+        return weights
+
+
+def build_reference_data(data_path=DATA_PATH, version=None):
+    severity_df = pd.read_csv(os.path.join(data_path, REFERENCE_FILES['severity']))
+    severity_map = dict(zip(
+        severity_df['Symptom'].str.strip().str.lower().str.replace(' ', '_'),
+        severity_df['weight'].astype(int)
+    ))
+
+    desc_df = pd.read_csv(os.path.join(data_path, REFERENCE_FILES['description']))
+    descriptions = {}
+    for disease, desc in zip(desc_df['Disease'], desc_df['Description']):
+        # Keep the first row per disease, like the old boolean-mask lookup
+        descriptions.setdefault(disease, desc)
+
+    prec_df = pd.read_csv(os.path.join(data_path, REFERENCE_FILES['precaution']))
+    prec_cols = [f'Precaution_{i}' for i in range(1, 5) if f'Precaution_{i}' in prec_df.columns]
+    precautions = {}
+    for _, row in prec_df.iterrows():
+        if row['Disease'] in precautions:
+            continue
+        precautions[row['Disease']] = tuple(row[c] for c in prec_cols if pd.notna(row[c]))
+
+    return ReferenceData(severity_map, descriptions, precautions, version)
+
+
+class ReferenceIndex:
+    """
+    Process-wide holder for ReferenceData.
+    Rebuilt only when one of the CSVs changes (mtime + size), checked at
+    most every check_interval seconds.
+    """
+
+    def __init__(self, data_path=DATA_PATH, check_interval=2.0):
+        self.data_path = data_path
+        self.check_interval = check_interval
+        self._data = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    def _signature(self):
+        sig = []
+        for name in sorted(REFERENCE_FILES):
+            st = os.stat(os.path.join(self.data_path, REFERENCE_FILES[name]))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        return tuple(sig)
+
+    def get(self):
+        data = self._data
+        now = time.monotonic()
+        if data is not None and now - self._last_check < self.check_interval:
+            return data
+
+        with self._lock:
+            if self._data is not None and now - self._last_check < self.check_interval:
+                return self._data
+            self._last_check = now
+            try:
+                signature = self._signature()
+            except OSError:
+                if self._data is not None:
+                    return self._data
+                raise
+            if self._data is None or self._data.version != signature:
+                self._data = build_reference_data(self.data_path, signature)
+            return self._data
+
+
+_index = ReferenceIndex()
+
+
+def get_reference_data():
+    return _index.get()
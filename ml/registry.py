@@ -0,0 +1,221 @@
+import joblib
+import logging
+import numpy as np
+import os
+import threading
+import time
+from ml.features import SymptomEncoder
+from ml.forest import CompiledForest, flatten_forest
+from ml.timing import timer
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_PATH = os.path.join(BASE_PATH, 'models')
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILES = {
+    'rf': 'random_forest_model.pkl',
+    'nb': 'naive_bayes_model.pkl',
+    'svm': 'svm_model.pkl',
+    'le': 'label_encoder.pkl',
+    'cols': 'symptom_columns.pkl',
+}
+
+# Flattened random forest written by train_model.py (optional)
+FOREST_FILE = 'random_forest_flat.joblib'
+
+# Rewritten by train_model.py after it has published a complete model set
+GENERATION_FILE = 'generation.json'
+
+# Artifacts are uncompressed joblib files, so their numpy arrays can be
+# memory-mapped: every worker maps the same page-cache pages instead of
+# holding a private copy. Copy-on-write ('c') rather than read-only,
+# because libsvm asks for writable buffers even though it never writes;
+# untouched pages stay shared. MEDIPREDICT_MMAP=0 reads them into memory.
+MMAP_MODE = 'c' if os.environ.get('MEDIPREDICT_MMAP', '1') != '0' else None
+
+
+class ModelBundle:
+    """
+    One consistent set of loaded artifacts.
+    A bundle is never mutated after it is built, so a request that grabbed
+    it keeps using the same models even if a reload swaps in a new one.
+    With a flattened forest, prediction never touches the sklearn forest
+    (sklearn copies every tree into private memory when unpickling it), so
+    rf may be a zero-argument loader that runs on first access instead.
+    """
+
+    def __init__(self, rf, nb, svm, le, cols, version, forest=None):
+        self._rf = rf
+        self._rf_lock = threading.Lock()
+        self.nb = nb
+        self.svm = svm
+        self.le = le
+        self.cols = cols
+        self.version = version
+        self.encoder = SymptomEncoder(cols)
+        self.forest = forest if forest is not None else flatten_forest(self.rf)
+        # Disease names in each model's own output order, so a predicted
+        # column index maps to a name without le.inverse_transform
+        self.class_names = np.asarray(le.classes_)
+        self.rf_names = self.class_names[self.forest.classes]
+        self.nb_names = self.class_names[nb.classes_]
+        self.svm_names = self.class_names[svm.classes_]
+        # Column of each RF output class in the NB / SVM probabilities
+        # (-1 where that model has no such class)
+        self.nb_columns = class_columns(self.forest.classes, nb.classes_)
+        self.svm_columns = class_columns(self.forest.classes, svm.classes_)
+
+    @property
+    def rf(self):
+        if callable(self._rf):
+            with self._rf_lock:
+                if callable(self._rf):
+                    self._rf = self._rf()
+        return self._rf
+
+    def as_tuple(self):
+        return self.rf, self.nb, self.svm, self.le, self.cols
+
+
+def class_columns(classes, model_classes):
+    """For each label in classes, its column in model_classes, or -1 if absent."""
+    position = {c: i for i, c in enumerate(np.asarray(model_classes).tolist())}
+    return np.array([position.get(c, -1) for c in np.asarray(classes).tolist()], dtype=np.intp)
+
+
+def _drop_feature_names(model):
+    # The models were fitted on a DataFrame; we always feed them plain arrays
+    # in symptom_columns order, so skip sklearn's per-call name validation.
+    if hasattr(model, 'feature_names_in_'):
+        del model.feature_names_in_
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the trained models.
+    Artifacts are unpickled once and reloaded only when models/ changes,
+    checked at most every check_interval seconds: the generation marker's
+    mtime + size if training has written one, else every artifact's.
+    """
+
+    def __init__(self, models_path=MODELS_PATH, check_interval=2.0):
+        self.models_path = models_path
+        self.check_interval = check_interval
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._listeners = []
+
+    def _signature(self):
+        # Training replaces the artifacts one by one and rewrites the
+        # generation marker last; when there is one, it alone decides when
+        # to reload, so a half-published set is never picked up
+        try:
+            st = os.stat(os.path.join(self.models_path, GENERATION_FILE))
+            return (('generation', st.st_mtime_ns, st.st_size),)
+        except FileNotFoundError:
+            pass
+        sig = []
+        for name in sorted(MODEL_FILES):
+            st = os.stat(os.path.join(self.models_path, MODEL_FILES[name]))
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        # The flattened forest is optional, but exporting it later must
+        # still swap running workers over to it
+        try:
+            st = os.stat(os.path.join(self.models_path, FOREST_FILE))
+            sig.append(('forest', st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(('forest', None, None))
+        return tuple(sig)
+
+    def _load_artifact(self, name):
+        artifact = joblib.load(os.path.join(self.models_path, MODEL_FILES[name]), mmap_mode=MMAP_MODE)
+        if name in ('rf', 'nb', 'svm'):
+            _drop_feature_names(artifact)
+        return artifact
+
+    def _load(self, signature):
+        with timer('load_models'):
+            forest = self._load_forest()
+            artifacts = {
+                name: self._load_artifact(name)
+                for name in MODEL_FILES if name != 'rf' or forest is None
+            }
+            if forest is not None:
+                artifacts['rf'] = lambda: self._load_artifact('rf')
+            return ModelBundle(version=signature, forest=forest, **artifacts)
+
+    def _load_forest(self):
+        # Use the exported forest only if it is at least as new as the RF pickle
+        forest_path = os.path.join(self.models_path, FOREST_FILE)
+        rf_path = os.path.join(self.models_path, MODEL_FILES['rf'])
+        try:
+            if os.stat(forest_path).st_mtime_ns >= os.stat(rf_path).st_mtime_ns:
+                return CompiledForest.load(forest_path, mmap_mode=MMAP_MODE)
+        except OSError:
+            pass
+        return None
+
+    def get(self):
+        """Return the current bundle, loading or hot-reloading it if needed."""
+        bundle = self._bundle
+        now = time.monotonic()
+        if bundle is not None and now - self._last_check < self.check_interval:
+            return bundle
+
+        with self._lock:
+            if self._bundle is not None and now - self._last_check < self.check_interval:
+                return self._bundle
+            self._last_check = now
+            try:
+                signature = self._signature()
+            except OSError:
+                # Files are being replaced; keep serving the old models
+                if self._bundle is not None:
+                    return self._bundle
+                raise
+            if self._bundle is None or self._bundle.version != signature:
+                try:
+                    bundle = self._load(signature)
+                except Exception:
+                    if self._bundle is None:
+                        raise
+                    # A file replaced in place may be half written; keep
+                    # serving the old models and retry at the next check
+                    logger.exception("Reloading models from %s failed; keeping the loaded ones",
+                                     self.models_path)
+                    return self._bundle
+                self._swap(bundle)
+            return self._bundle
+
+    def reload(self):
+        """Force a reload from disk regardless of file signatures."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._swap(self._load(self._signature()))
+            return self._bundle
+
+    def _swap(self, bundle):
+        # Single reference assignment: in-flight requests keep their old bundle
+        self._bundle = bundle
+        for callback in list(self._listeners):
+            callback(bundle)
+
+    def add_listener(self, callback):
+        """Call callback(bundle) every time a new bundle is swapped in."""
+        with self._lock:
+            self._listeners.append(callback)
+            if self._bundle is not None:
+                callback(self._bundle)
+
+
+_registry = ModelRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def get_models():
+    return _registry.get()
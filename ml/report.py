@@ -0,0 +1,229 @@
+import io
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from ml.timing import timer
+
+DISCLAIMER = (
+    "This tool is for educational purposes only. Always consult a certified "
+    "medical professional. The predictions provided by this AI should not be "
+    "taken as a final medical diagnosis."
+)
+
+_styles = None
+_styles_lock = threading.Lock()
+
+
+def get_styles():
+    """
+    The report stylesheet, built once per process.
+    Styles are only read while rendering, so threads can share them.
+    Flowables are not shared: reportlab stores layout state on them.
+    """
+    global _styles
+    if _styles is None:
+        with _styles_lock:
+            if _styles is None:
+                styles = getSampleStyleSheet()
+                styles.add(ParagraphStyle('Disclaimer', parent=styles['Normal'], textColor=colors.red))
+                _styles = styles
+    return _styles
+
+
+def report_token():
+    """
+    Random token for one prediction's report. Not derived from the result,
+    so the same symptoms from two users get separate reports, and a token
+    cannot be computed to probe whether someone submitted them.
+    """
+    return secrets.token_hex(16)
+
+
+def build_report_pdf(result, generated_at=None):
+    """Render the patient report for one result and return the PDF bytes."""
+    with timer('render_report'):
+        return _render_report(result, generated_at)
+
+
+def _render_report(result, generated_at=None):
+    generated_at = generated_at or datetime.now()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = get_styles()
+    elements = []
+
+    # Header
+    elements.append(Paragraph("MediPredict AI - Patient Report", styles['Title']))
+    elements.append(Paragraph(f"Date: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Symptoms
+    elements.append(Paragraph("Symptoms Entered:", styles['Heading2']))
+    elements.append(Paragraph(", ".join(result['symptoms_entered']), styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Prediction
+    elements.append(Paragraph(f"Primary Predicted Disease: {result['primary_prediction']}", styles['Heading2']))
+    elements.append(Paragraph(f"Confidence Score: {result['confidence']}%", styles['Normal']))
+    elements.append(Paragraph(f"Risk Level: {result['risk_level']}", styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Description
+    elements.append(Paragraph("Disease Description:", styles['Heading2']))
+    elements.append(Paragraph(result['description'], styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Precautions
+    elements.append(Paragraph("Recommended Precautions:", styles['Heading2']))
+    for p in result['precautions']:
+        elements.append(Paragraph(f"- {p}", styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Disclaimer
+    elements.append(Spacer(1, 24))
+    elements.append(Paragraph("--- MEDICAL DISCLAIMER ---", styles['Heading3']))
+    elements.append(Paragraph(DISCLAIMER, styles['Disclaimer']))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+class ReportStore:
+    """
+    Results addressed by a random report_token() each, plus their rendered PDFs.
+    Results are kept LRU up to max_results; PDFs are rendered off the
+    request thread in a worker pool and kept LRU up to max_pdf_bytes.
+    Use executor='process' to keep reportlab off the web process's GIL.
+    """
+
+    def __init__(self, max_results=2048, max_pdf_bytes=32 * 1024 * 1024,
+                 executor='thread', max_workers=2):
+        self.max_results = max_results
+        self.max_pdf_bytes = max_pdf_bytes
+        self.executor_kind = executor
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._results = OrderedDict()
+        self._pdfs = OrderedDict()
+        self._pending = {}
+        self._failed = {}
+        self._pdf_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Pools do not survive fork(); each gunicorn worker makes its own
+        if self._executor is None or self._pid != os.getpid():
+            pool = ProcessPoolExecutor if self.executor_kind == 'process' else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.max_workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def put(self, result, prerender=False):
+        """Remember a result and return its token; prerender starts rendering now."""
+        token = report_token()
+        with self._lock:
+            self._results[token] = (result, datetime.now())
+            while len(self._results) > self.max_results:
+                old, _ = self._results.popitem(last=False)
+                self._drop_pdf(old)
+                self._failed.pop(old, None)
+        if prerender:
+            self.render_async(token)
+        return token
+
+    def get_result(self, token):
+        with self._lock:
+            entry = self._results.get(token)
+            return entry[0] if entry else None
+
+    def render_async(self, token):
+        """Start rendering token's PDF in the pool; returns the Future, or None."""
+        with self._lock:
+            if token in self._pending:
+                return self._pending[token]
+            entry = self._results.get(token)
+            if entry is None or token in self._pdfs:
+                return None
+            self._failed.pop(token, None)
+            future = self._get_executor().submit(build_report_pdf, *entry)
+            self._pending[token] = future
+        future.add_done_callback(lambda f: self._finish(token, f))
+        return future
+
+    def _finish(self, token, future):
+        with self._lock:
+            self._pending.pop(token, None)
+            if future.exception() is not None:
+                # Not for a result evicted while it rendered: it is unknown now
+                if token in self._results:
+                    self._failed[token] = str(future.exception())
+                return
+        self._store_pdf(token, future.result())
+
+    def status(self, token):
+        """'ready', 'pending', 'failed', 'not_started' or 'unknown'."""
+        with self._lock:
+            if token in self._pdfs:
+                return 'ready'
+            if token in self._pending:
+                return 'pending'
+            if token in self._failed:
+                return 'failed'
+            if token in self._results:
+                return 'not_started'
+            return 'unknown'
+
+    def get_pdf(self, token, timeout=None):
+        """
+        PDF bytes for token, rendering it if needed and waiting up to timeout
+        seconds. Returns None if the token is unknown or rendering is still
+        running when the timeout expires.
+        """
+        with self._lock:
+            pdf = self._pdfs.get(token)
+            if pdf is not None:
+                self._pdfs.move_to_end(token)
+                return pdf
+        future = self.render_async(token)
+        if future is None:
+            with self._lock:
+                return self._pdfs.get(token)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            return None
+
+    def _store_pdf(self, token, pdf):
+        with self._lock:
+            if token in self._pdfs or token not in self._results:
+                return
+            self._pdfs[token] = pdf
+            self._pdf_bytes += len(pdf)
+            while self._pdf_bytes > self.max_pdf_bytes and len(self._pdfs) > 1:
+                old = next(iter(self._pdfs))
+                self._drop_pdf(old)
+
+    def _drop_pdf(self, token):
+        pdf = self._pdfs.pop(token, None)
+        if pdf is not None:
+            self._pdf_bytes -= len(pdf)
+
+
+_store = ReportStore(
+    executor=os.environ.get('MEDIPREDICT_REPORT_EXECUTOR', 'thread'),
+    max_workers=int(os.environ.get('MEDIPREDICT_REPORT_WORKERS', 2))
+)
+
+
+def get_report_store():
+    return _store
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+from ml.predict import predict_diseases_batch
+from ml.timing import current_timings, start_collecting, stop_collecting
+
+
+class BatchStats:
+    """Running batch-size and queueing-delay metrics for a MicroBatcher."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = {}
+        self.max_queue_delay_ms = 0.0
+        self._recent_delays = deque(maxlen=window)
+
+    def record(self, size, delays_ms):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+            self.max_queue_delay_ms = max(self.max_queue_delay_ms, max(delays_ms))
+            self._recent_delays.extend(delays_ms)
+
+    def snapshot(self):
+        with self._lock:
+            delays = np.array(self._recent_delays) if self._recent_delays else np.zeros(1)
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'mean_batch_size': round(self.requests / self.batches, 3) if self.batches else 0.0,
+                'batch_size_histogram': dict(sorted(self.batch_sizes.items())),
+                'queue_delay_ms': {
+                    'p50': round(float(np.percentile(delays, 50)), 3),
+                    'p95': round(float(np.percentile(delays, 95)), 3),
+                    'p99': round(float(np.percentile(delays, 99)), 3),
+                    'max': round(self.max_queue_delay_ms, 3),
+                },
+            }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single predictions into small batches.
+    Each caller blocks on predict(); a background thread drains the queue,
+    waiting at most max_wait_ms for up to max_batch_size requests, runs
+    batch_fn once over them and hands every caller its own result.
+    """
+
+    def __init__(self, batch_fn=predict_diseases_batch, max_batch_size=32, max_wait_ms=2.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = BatchStats()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so a pre-forked gunicorn worker
+        # starts its own batching thread on first use.
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._worker.start()
+
+    def submit(self, symptoms_list):
+        """Queue one symptom list; returns a Future resolving to its result dict."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((symptoms_list, future, time.perf_counter(), current_timings()))
+        return future
+
+    def predict(self, symptoms_list, timeout=None):
+        return self.submit(symptoms_list).result(timeout)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            started = time.perf_counter()
+            self.stats.record(len(items), [(started - t) * 1000.0 for _, _, t, _ in items])
+            # Stage timings of the shared batch are reported to every caller
+            # (their Server-Timing), along with the caller's own queue wait
+            batch_timings, token = start_collecting()
+            try:
+                outcomes = self._call([symptoms for symptoms, _, _, _ in items])
+            finally:
+                stop_collecting(token)
+            for (_, future, queued, timings), (result, error) in zip(items, outcomes):
+                if error is not None:
+                    future.set_exception(error)
+                    continue
+                if timings is not None:
+                    timings.append(('queue', started - queued))
+                    timings.extend(batch_timings)
+                future.set_result(result)
+
+    def _call(self, symptom_lists):
+        """
+        (result, exception) for each symptom list. If the batch fails, its
+        items are rerun one at a time so only the bad request gets the error.
+        """
+        try:
+            return [(result, None) for result in self.batch_fn(symptom_lists)]
+        except Exception as e:
+            if len(symptom_lists) == 1:
+                return [(None, e)]
+        outcomes = []
+        for symptoms in symptom_lists:
+            try:
+                outcomes.append((self.batch_fn([symptoms])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
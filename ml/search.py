@@ -0,0 +1,218 @@
+import bisect
+import hashlib
+import json
+import threading
+from functools import lru_cache
+
+from ml.features import display_symptom
+from ml.reference import get_reference_data
+from ml.registry import get_models, get_registry
+
+# Everyday words -> symptom columns; targets missing from the model are dropped
+SYNONYMS = {
+    'fever': ['high_fever', 'mild_fever'],
+    'temperature': ['high_fever', 'mild_fever'],
+    'tired': ['fatigue', 'lethargy'],
+    'tiredness': ['fatigue', 'lethargy'],
+    'exhaustion': ['fatigue'],
+    'itchy': ['itching', 'internal_itching'],
+    'rash': ['skin_rash', 'red_spots_over_body'],
+    'throwing up': ['vomiting'],
+    'puking': ['vomiting'],
+    'sick to stomach': ['nausea'],
+    'queasy': ['nausea'],
+    'stomach ache': ['stomach_pain', 'abdominal_pain', 'belly_pain'],
+    'tummy ache': ['stomach_pain', 'abdominal_pain', 'belly_pain'],
+    'diarrhea': ['diarrhoea'],
+    'loose motions': ['diarrhoea'],
+    'heartburn': ['acidity', 'indigestion'],
+    'short of breath': ['breathlessness'],
+    'shortness of breath': ['breathlessness'],
+    'dizzy': ['dizziness', 'spinning_movements', 'loss_of_balance'],
+    'vertigo': ['spinning_movements', 'dizziness'],
+    'sore throat': ['throat_irritation', 'patches_in_throat'],
+    'stuffy nose': ['congestion', 'sinus_pressure'],
+    'sneezing': ['continuous_sneezing'],
+    'migraine': ['headache'],
+    'jaundice': ['yellowish_skin', 'yellowing_of_eyes', 'dark_urine'],
+    'yellow skin': ['yellowish_skin'],
+    'yellow eyes': ['yellowing_of_eyes'],
+    'pee': ['burning_micturition', 'polyuria', 'continuous_feel_of_urine'],
+    'peeing': ['burning_micturition', 'polyuria', 'continuous_feel_of_urine'],
+    'urination': ['burning_micturition', 'polyuria', 'spotting__urination'],
+    'frequent urination': ['polyuria'],
+    'thirst': ['dehydration'],
+    'sweat': ['sweating'],
+    'shaking': ['shivering', 'chills'],
+    'palpitation': ['palpitations', 'fast_heart_rate'],
+    'racing heart': ['fast_heart_rate', 'palpitations'],
+    'weight gain': ['weight_gain', 'obesity'],
+    'overweight': ['obesity'],
+    'swelling': ['swelling_joints', 'swollen_legs', 'swollen_extremeties', 'puffy_face_and_eyes'],
+    'pimples': ['pus_filled_pimples', 'blackheads'],
+    'acne': ['pus_filled_pimples', 'blackheads'],
+    'sad': ['depression', 'mood_swings'],
+    'anxious': ['anxiety', 'restlessness'],
+    'blurry vision': ['blurred_and_distorted_vision', 'visual_disturbances'],
+    'stiffness': ['movement_stiffness', 'stiff_neck'],
+    'bloating': ['passage_of_gases', 'distention_of_abdomen', 'swelling_of_stomach'],
+    'gas': ['passage_of_gases'],
+}
+
+# Match kinds, best first
+EXACT, PREFIX, WORD_PREFIX, SYNONYM, FUZZY = range(5)
+MATCH_NAMES = ('exact', 'prefix', 'word_prefix', 'synonym', 'fuzzy')
+
+
+def search_key(text):
+    """'Skin_Rash ' / 'skin rash' -> 'skin rash' (lower case, single spaces)."""
+    return ' '.join(text.replace('_', ' ').lower().split())
+
+
+def prefix_distance(query, term, max_distance):
+    """
+    Smallest edit distance between query and any prefix of term, or
+    max_distance + 1 if it is larger. Typing 'diarh' is close to a prefix
+    of 'diarrhoea'.
+    """
+    # Longer prefixes of term cannot be within max_distance of query
+    term = term[:len(query) + max_distance]
+    previous = list(range(len(term) + 1))
+    for i, qc in enumerate(query, 1):
+        current = [i]
+        for j, tc in enumerate(term, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (qc != tc)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous)
+
+
+class SymptomIndex:
+    """
+    Autocomplete over the model's symptom columns.
+    A sorted array of (term, column) pairs -- each full name plus every
+    word suffix of it ('skin rash', 'rash') -- answers prefix queries with
+    two bisects; synonyms map lay words onto columns; a bounded edit
+    distance over the (small) term list catches typos when nothing matches
+    as typed. Ranked results are cached per query. Ties are broken by
+    severity weight, then name.
+    """
+
+    def __init__(self, cols, severity_map, synonyms=SYNONYMS):
+        self.cols = list(cols)
+        self.severity = [int(severity_map.get(c, 0)) for c in self.cols]
+        self.display = [display_symptom(c) for c in self.cols]
+        col_index = {c: i for i, c in enumerate(self.cols)}
+
+        terms = set()
+        for i, col in enumerate(self.cols):
+            words = search_key(col).split()
+            for start in range(len(words)):
+                terms.add((' '.join(words[start:]), i, start == 0))
+        self.terms = sorted(terms)
+        self.term_keys = [term for term, _, _ in self.terms]
+
+        self.synonyms = sorted(
+            (search_key(word), [col_index[c] for c in targets if c in col_index])
+            for word, targets in synonyms.items()
+        )
+        self.synonyms = [(word, ids) for word, ids in self.synonyms if ids]
+        self.synonym_keys = [word for word, _ in self.synonyms]
+
+        payload = json.dumps([self.cols, self.severity, self.synonyms])
+        self.version = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+        self._search = lru_cache(maxsize=4096)(self._rank)
+
+    def _prefix_range(self, keys, query):
+        lo = bisect.bisect_left(keys, query)
+        hi = bisect.bisect_left(keys, query + '\uffff')
+        return range(lo, hi)
+
+    def _rank(self, query):
+        """All matching column ids for query, best first (cached per query)."""
+        best = {}
+
+        def offer(i, kind, distance=0, matched=None):
+            rank = (kind, distance)
+            if i not in best or rank < best[i][0]:
+                best[i] = (rank, matched)
+
+        if not query:
+            return tuple((i, 'all', None) for i in sorted(range(len(self.cols)), key=self.display.__getitem__))
+
+        for pos in self._prefix_range(self.term_keys, query):
+            term, i, whole = self.terms[pos]
+            if whole and term == query:
+                offer(i, EXACT)
+            else:
+                offer(i, PREFIX if whole else WORD_PREFIX)
+        for pos in self._prefix_range(self.synonym_keys, query):
+            word, ids = self.synonyms[pos]
+            for i in ids:
+                offer(i, SYNONYM, matched=word)
+
+        # Typo tolerance, only when nothing matched as typed:
+        # 1 edit from 3 characters on, 2 from 6
+        max_distance = 0 if len(query) < 3 else 1 if len(query) < 6 else 2
+        if not best and max_distance:
+            for term, i, _ in self.terms:
+                d = prefix_distance(query, term, max_distance)
+                if d <= max_distance:
+                    offer(i, FUZZY, d)
+            for word, ids in self.synonyms:
+                d = prefix_distance(query, word, max_distance)
+                if d <= max_distance:
+                    for i in ids:
+                        offer(i, FUZZY, d, matched=word)
+
+        order = sorted(best, key=lambda i: (best[i][0], -self.severity[i], self.display[i]))
+        return tuple((i, MATCH_NAMES[best[i][0][0]], best[i][1]) for i in order)
+
+    def search(self, query, limit=10, offset=0):
+        """One page of ranked matches plus the total count."""
+        query = search_key(query)
+        ranked = self._search(query)
+        results = [self._item(i, match, matched) for i, match, matched in ranked[offset:offset + limit]]
+        return {'query': query, 'total': len(ranked), 'offset': offset,
+                'limit': limit, 'results': results}
+
+    def _item(self, i, match, matched=None):
+        item = {
+            'value': self.display[i],
+            'symptom': self.cols[i],
+            'severity': self.severity[i],
+            'match': match,
+        }
+        if matched:
+            item['matched'] = matched
+        return item
+
+
+def build_symptom_index(cols=None, ref=None):
+    cols = cols if cols is not None else get_models().cols
+    # Same severity weights as predictions use, parsed in one place
+    ref = ref if ref is not None else get_reference_data()
+    return SymptomIndex(cols, ref.severity_map)
+
+
+_index = None
+_register_lock = threading.Lock()
+
+
+def _rebuild(bundle):
+    global _index
+    # A single reference swap, like the model registry
+    _index = build_symptom_index(bundle.cols)
+
+
+def get_symptom_index():
+    """The process-wide index, built on first use and rebuilt when the models change."""
+    if _index is None:
+        with _register_lock:
+            if _index is None:
+                # add_listener calls _rebuild right away once models are loaded
+                get_models()
+                get_registry().add_listener(_rebuild)
+    return _index
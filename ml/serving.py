@@ -0,0 +1,158 @@
+import hashlib
+import os
+import threading
+import time
+
+# Serving state shared by the Flask app (app.py) and the ASGI app (asgi.py).
+# Only the stdlib is imported here: the model, pandas and reportlab modules
+# are imported on first use or by warm_up(), so importing either app is cheap.
+
+# Concurrent single predictions are coalesced into small batches.
+# MEDIPREDICT_MICROBATCH=0 turns this off and predicts inline.
+MICROBATCH = os.environ.get('MEDIPREDICT_MICROBATCH', '1') != '0'
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """The process-wide MicroBatcher, or None when micro-batching is off."""
+    global _batcher
+    if MICROBATCH and _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from ml.scheduler import MicroBatcher
+                _batcher = MicroBatcher(
+                    max_batch_size=int(os.environ.get('MEDIPREDICT_MICROBATCH_SIZE', 32)),
+                    max_wait_ms=float(os.environ.get('MEDIPREDICT_MICROBATCH_WAIT_MS', 2))
+                )
+    return _batcher
+
+
+class InvalidSymptoms(ValueError):
+    pass
+
+
+def check_symptoms(symptoms):
+    """Raise InvalidSymptoms unless symptoms is a list of strings."""
+    if not isinstance(symptoms, list) or not all(isinstance(s, str) for s in symptoms):
+        raise InvalidSymptoms('symptoms must be a list of strings')
+
+
+def run_prediction(symptoms):
+    # Checked before queueing: a bad entry must not fail the batch it joins
+    check_symptoms(symptoms)
+    batcher = get_batcher()
+    if batcher is None:
+        from ml.predict import predict_disease
+        return predict_disease(symptoms)
+    return batcher.predict(symptoms)
+
+
+_symptoms = None
+
+
+def symptom_names():
+    """Display names of the model's symptom columns ([] if the models are missing)."""
+    global _symptoms
+    if _symptoms is None:
+        from ml.features import display_symptoms
+        from ml.registry import get_models
+        try:
+            _symptoms = display_symptoms(get_models().cols)
+        except Exception:
+            return []
+    return _symptoms
+
+
+# Largest page /api/symptoms/search returns, and how long clients may cache it
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_AGE = int(os.environ.get('MEDIPREDICT_SEARCH_MAX_AGE', 300))
+
+
+def search_page(query, limit=10, offset=0, known_etags=()):
+    """
+    (etag, page) for /api/symptoms/search, or (etag, None) when known_etags
+    (the If-None-Match tags) already holds it. limit and offset may be
+    strings; they are clamped, and ValueError means they are not integers.
+    """
+    from ml.search import get_symptom_index, search_key
+    limit = min(max(int(limit), 1), SEARCH_MAX_LIMIT)
+    offset = max(int(offset), 0)
+    index = get_symptom_index()
+    # Answers depend only on the index version and the normalized query
+    key = f"{index.version}|{search_key(query)}|{limit}|{offset}"
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+    if etag in known_etags or '*' in known_etags:
+        return etag, None
+    return etag, index.search(query, limit=limit, offset=offset)
+
+
+def get_report_status(token):
+    """(body, HTTP status) for /report/<token>/status; asking starts a lazy render."""
+    from ml.report import get_report_store
+    reports = get_report_store()
+    status = reports.status(token)
+    if status == 'not_started':
+        reports.render_async(token)
+        status = reports.status(token)
+    if status == 'unknown':
+        return {'status': status}, 404
+    return {'status': status, 'download_url': f'/download-report/{token}'}, 200
+
+
+_ready = threading.Event()
+_warmup = {}
+
+
+def warm_up():
+    """
+    Import the heavy modules and load everything a request touches: the
+    models, reference data, symptom index and report styles, plus one
+    prediction through every model. gunicorn.conf.py runs this in the
+    master before forking so workers share the loaded pages copy-on-write.
+    """
+    start = time.perf_counter()
+    from ml.predict import evaluate_ensemble
+    from ml.reference import get_reference_data
+    from ml.registry import get_models
+    from ml.report import get_styles
+    from ml.search import get_symptom_index
+
+    models = get_models()
+    X = models.encoder.matrix_from_indices([[]])
+    evaluate_ensemble(models, X)
+    evaluate_ensemble(models, X, use_proba=True)
+    get_reference_data()
+    get_symptom_index()
+    get_styles()
+    symptom_names()
+    _warmup['seconds'] = round(time.perf_counter() - start, 3)
+    _ready.set()
+
+
+def start_warm_up(mode, on_error=None):
+    """
+    mode 'background': warm up in a daemon thread; 'sync': before returning;
+    'off': leave it to the caller (gunicorn.conf.py warms up in the master).
+    A failed warm-up is reported to on_error(exc); requests then load what
+    they need on first use.
+    """
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            _warmup['error'] = str(e)
+            if on_error is not None:
+                on_error(e)
+
+    if mode == 'sync':
+        run()
+    elif mode == 'background':
+        threading.Thread(target=run, name='warm-up', daemon=True).start()
+
+
+def readiness():
+    """(ready, details): ready once warm_up() has finished in this process or its preloading master."""
+    if _ready.is_set():
+        return True, {'status': 'ready', 'pid': os.getpid(), **_warmup}
+    return False, {'status': 'failed' if 'error' in _warmup else 'warming_up', **_warmup}
@@ -0,0 +1,110 @@
+import numpy as np
+from scipy import sparse
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import Pipeline
+
+
+class LinearProbaSVM:
+    """
+    A calibrated linear SVM (optionally on Nystroem RBF features) reduced to
+    plain arrays. predict_proba is an optional RBF feature map, one
+    n_features x n_classes matmul and a per-class sigmoid, with the same
+    output as CalibratedClassifierCV(method='sigmoid', ensemble=False).
+    """
+
+    def __init__(self, classes, coef, intercept, cal_a, cal_b,
+                 components=None, normalization=None, gamma=None):
+        self.classes_ = classes
+        self.coef = coef
+        self.intercept = intercept
+        self.cal_a = cal_a
+        self.cal_b = cal_b
+        self.components = components
+        self.normalization = normalization
+        self.gamma = gamma
+
+    accepts_sparse = True
+    chunk_size = 4096
+
+    def _features(self, X):
+        X = X.astype(np.float64) if sparse.issparse(X) else np.asarray(X, dtype=np.float64)
+        if self.components is None:
+            return X
+        if sparse.issparse(X):
+            row_sq = np.asarray(X.multiply(X).sum(axis=1))
+        else:
+            row_sq = (X * X).sum(axis=1)[:, None]
+        # RBF kernel against the Nystroem landmarks, then the whitening map
+        sq_dist = (
+            row_sq
+            - 2 * (X @ self.components.T)
+            + (self.components * self.components).sum(axis=1)[None, :]
+        )
+        np.maximum(sq_dist, 0, out=sq_dist)
+        return np.exp(-self.gamma * sq_dist) @ self.normalization.T
+
+    def decision_function(self, X):
+        # Row blocks bound the float64 copy of X and the Nystroem kernel
+        # matrix; sparse blocks stay sparse through the linear case
+        scores = np.empty((X.shape[0], len(self.intercept)))
+        for start in range(0, X.shape[0], self.chunk_size):
+            block = self._features(X[start:start + self.chunk_size])
+            scores[start:start + self.chunk_size] = block @ self.coef.T
+        scores += self.intercept
+        return scores
+
+    def predict_proba(self, X):
+        # Sigmoid calibration, in place on the score matrix
+        proba = self.decision_function(X)
+        proba *= self.cal_a
+        proba += self.cal_b
+        np.exp(proba, out=proba)
+        proba += 1.0
+        np.reciprocal(proba, out=proba)
+        n_classes = len(self.classes_)
+        if n_classes == 2:
+            proba = np.column_stack([1.0 - proba[:, -1], proba[:, -1]])
+        else:
+            denominator = proba.sum(axis=1, keepdims=True)
+            zero = denominator[:, 0] == 0
+            denominator[zero] = 1.0
+            proba /= denominator
+            proba[zero] = 1 / n_classes
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def compile_svm(model):
+    """
+    Reduce a fitted sigmoid-calibrated LinearSVC / Nystroem+LinearSVC
+    pipeline to a LinearProbaSVM. Any other model is returned unchanged.
+    """
+    if not isinstance(model, CalibratedClassifierCV) or len(model.calibrated_classifiers_) != 1:
+        return model
+    calibrated = model.calibrated_classifiers_[0]
+    if calibrated.method != 'sigmoid':
+        return model
+    estimator = calibrated.estimator
+    components = normalization = gamma = None
+    if isinstance(estimator, Pipeline):
+        nystroem, estimator = estimator.steps[0][1], estimator.steps[-1][1]
+        if nystroem.kernel != 'rbf':
+            return model
+        components = nystroem.components_
+        normalization = nystroem.normalization_
+        gamma = nystroem.gamma if nystroem.gamma is not None else 1.0 / components.shape[1]
+
+    # The calibrators follow estimator.classes_, which matches model.classes_ here
+    return LinearProbaSVM(
+        classes=model.classes_,
+        coef=np.ascontiguousarray(estimator.coef_, dtype=np.float64),
+        intercept=np.asarray(estimator.intercept_, dtype=np.float64),
+        cal_a=np.array([c.a_ for c in calibrated.calibrators], dtype=np.float64),
+        cal_b=np.array([c.b_ for c in calibrated.calibrators], dtype=np.float64),
+        components=components,
+        normalization=normalization,
+        gamma=gamma,
+    )
@@ -0,0 +1,209 @@
+import atexit
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Stage timers feed process-wide Prometheus histograms and, inside a
+# request, the per-request list used for the Server-Timing header.
+# MEDIPREDICT_TIMING=0 turns every timer into a shared no-op.
+TIMING_ENABLED = os.environ.get('MEDIPREDICT_TIMING', '1') != '0'
+
+# Seconds; prediction stages are sub-millisecond, report rendering is ~10 ms
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """A Prometheus histogram with one label, rendered in the text format."""
+
+    def __init__(self, name, documentation, label, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for value, (counts, total, count) in sorted(series.items()):
+            label = f'{self.label}="{value}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label}}} {total:.9g}')
+            lines.append(f'{self.name}_count{{{label}}} {count}')
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram('medipredict_stage_seconds', 'Time spent in each inference stage.', 'stage')
+REQUEST_SECONDS = Histogram('medipredict_request_seconds', 'HTTP request latency by route.', 'route')
+
+# Timings of the request (or micro-batch) being served on this context
+_current = contextvars.ContextVar('medipredict_timings', default=None)
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage):
+    """with timer('encode'): ...  -- a no-op when timing is disabled."""
+    return _Timer(stage) if TIMING_ENABLED else _NULL_TIMER
+
+
+def record(stage, seconds):
+    STAGE_SECONDS.observe(stage, seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def start_collecting():
+    """Collect this context's stage timings from now on; returns a reset token."""
+    timings = []
+    return timings, _current.set(timings)
+
+
+def stop_collecting(token):
+    _current.reset(token)
+
+
+def current_timings():
+    """The list collecting this context's timings, or None."""
+    return _current.get()
+
+
+def server_timing_header(timings, total=None):
+    """'encode;dur=0.012, rf;dur=0.61, total;dur=1.3' (milliseconds, repeated stages summed)."""
+    merged = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    if total is not None:
+        merged['total'] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in merged.items())
+
+
+def render_metrics():
+    return "\n".join([STAGE_SECONDS.render(), REQUEST_SECONDS.render(), ""])
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack every interval_ms and writes the
+    counts in the folded format ("thread;mod:func;mod:func count") that
+    flamegraph.pl, speedscope and inferno read.
+    """
+
+    def __init__(self, output, interval_ms=5.0, dump_every_s=30.0):
+        self.output = output
+        self.interval = interval_ms / 1000.0
+        self.dump_every = dump_every_s
+        self.samples = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        atexit.register(self.dump)
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        last_dump = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    self.samples[";".join(reversed(stack))] += 1
+            if time.monotonic() - last_dump >= self.dump_every:
+                self.dump()
+                last_dump = time.monotonic()
+
+    def dump(self):
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        tmp = f"{self.output}.tmp"
+        with open(tmp, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.output)
+
+
+_profiler = None
+
+
+def start_profiler_from_env():
+    """
+    MEDIPREDICT_PROFILE=1 starts the sampling profiler for this process.
+    Stacks go to MEDIPREDICT_PROFILE_DIR/profile-<pid>.folded (default /tmp),
+    sampled every MEDIPREDICT_PROFILE_INTERVAL_MS (default 5).
+    """
+    global _profiler
+    if os.environ.get('MEDIPREDICT_PROFILE', '0') != '1':
+        return None
+    # Threads do not survive fork(); each worker process samples itself
+    if _profiler is not None and _profiler.pid == os.getpid():
+        return _profiler
+    out_dir = os.environ.get('MEDIPREDICT_PROFILE_DIR', '/tmp')
+    _profiler = SamplingProfiler(
+        os.path.join(out_dir, f"profile-{os.getpid()}.folded"),
+        interval_ms=float(os.environ.get('MEDIPREDICT_PROFILE_INTERVAL_MS', 5))
+    ).start()
+    return _profiler
@@ -1,72 +1,313 @@
-import pandas as pd
 import numpy as np
+import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.svm import SVC
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.svm import SVC, LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import make_pipeline
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
 import joblib
+import json
 import os
+import shutil
+import sklearn
+import tempfile
+import time
+from ml.forest import flatten_forest
+from ml.registry import FOREST_FILE, GENERATION_FILE
+from ml.svm import compile_svm
+from ml.naive_bayes import BinaryNaiveBayes
+from ml.features import SymptomEncoder
+from ml.dataset import load_training_data
+
+MODELS_DIR = 'models'
+MANIFEST = os.path.join(MODELS_DIR, 'training_manifest.json')
+SPLIT = {'test_size': 0.2, 'random_state': 42}
+CV_FOLDS = 2  # Using cv=2 for small placeholder dataset
+
+# Which SVM to train: the exact RBF SVC, or a cheaper calibrated linear
+# model (optionally on Nystroem RBF features) whose predict is a matmul
+SVM_KINDS = ('rbf', 'linear', 'nystroem')
+SVM_KIND = os.environ.get('MEDIPREDICT_SVM_KIND', 'rbf')
+
+
+def make_svm(kind=None):
+    kind = kind or SVM_KIND
+    if kind == 'rbf':
+        return SVC(kernel='rbf', probability=True, random_state=42)
+    # One calibrated model (ensemble=False) keeps prediction to a single matmul
+    if kind == 'linear':
+        base = LinearSVC(C=1.0, random_state=42)
+    elif kind == 'nystroem':
+        base = make_pipeline(
+            Nystroem(kernel='rbf', n_components=300, random_state=42),
+            LinearSVC(C=1.0, random_state=42)
+        )
+    else:
+        raise ValueError(f"Unknown SVM kind {kind!r}; expected one of {SVM_KINDS}")
+    return CalibratedClassifierCV(base, method='sigmoid', cv=3, ensemble=False)
+
+
+def make_models(svm_kind=None):
+    """name -> (unfitted estimator, artifact file)"""
+    return {
+        # 1. Random Forest (PRIMARY MODEL)
+        'Random Forest': (RandomForestClassifier(
+            n_estimators=200,
+            max_depth=15,
+            random_state=42,
+            n_jobs=-1
+        ), 'random_forest_model.pkl'),
+        # 2. Naive Bayes (Bernoulli likelihood: symptoms are 0/1)
+        'Naive Bayes': (BinaryNaiveBayes(alpha=1.0), 'naive_bayes_model.pkl'),
+        # 3. SVM
+        'SVM': (make_svm(svm_kind), 'svm_model.pkl'),
+    }
+
+
+def data_fingerprint(data):
+    """Hash identifying the training data: the source CSV's, else the arrays'."""
+    if data.meta.get('source_sha256'):
+        return data.meta['source_sha256']
+    digest = hashlib.sha256(np.ascontiguousarray(data.X).data)
+    digest.update(np.ascontiguousarray(data.y).data)
+    return digest.hexdigest()
+
+
+def model_key(model, data_hash, stage):
+    """Cache key: data hash + estimator class and hyperparameters + split + sklearn version."""
+    params = sorted((k, repr(v)) for k, v in model.get_params().items())
+    payload = json.dumps([stage, type(model).__name__, params, SPLIT, CV_FOLDS,
+                          sklearn.__version__, data_hash])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def atomic_dump(obj, path):
+    # Write-then-rename so the model registry never sees a half-written file
+    tmp = f"{path}.tmp{os.getpid()}"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def publish(staging_dir):
+    """
+    Move every artifact in staging_dir into models/, then rewrite the
+    generation marker. The registry reloads on the marker alone, so
+    serving processes switch to the new set only once all of it is in place.
+    """
+    # The flat forest goes after the RF pickle, so it is never older than it
+    names = sorted(os.listdir(staging_dir), key=lambda name: name == FOREST_FILE)
+    for name in names:
+        os.replace(os.path.join(staging_dir, name), os.path.join(MODELS_DIR, name))
+    marker = os.path.join(MODELS_DIR, GENERATION_FILE)
+    tmp = f"{marker}.tmp{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump({'published_ns': time.time_ns(), 'files': names}, f)
+    os.replace(tmp, marker)
+
+
+def _load_split(sparse_input=False):
+    # Every worker memory-maps the same files; the OS shares the pages
+    data = load_training_data()
+    y = LabelEncoder().fit_transform(data.labels())
+    X = data.sparse_features() if sparse_input else data.X
+    return X, y, train_test_split(X, y, **SPLIT)
+
+
+def _fit_input(model, X):
+    # Fitted on CSR, the exact SVC would only predict on sparse input
+    # (libsvm converts every dense row); it gets the dense matrix instead
+    if isinstance(model, SVC) and not isinstance(X, np.ndarray):
+        return X.toarray()
+    return X
+
 
-def train_all_models():
+def fit_model(name, svm_kind=None, sparse_input=False, out_dir=MODELS_DIR):
+    """Pool task: fit one model on the shared split, save it to out_dir, return its accuracy."""
+    start = time.perf_counter()
+    model, filename = make_models(svm_kind)[name]
+    _, _, (X_train, X_test, y_train, y_test) = _load_split(sparse_input)
+    model.fit(_fit_input(model, X_train), y_train)
+    # Calibrated linear / Nystroem SVMs are saved as a plain-array matmul model
+    model = compile_svm(model)
+    acc = accuracy_score(y_test, model.predict(_fit_input(model, X_test)))
+    atomic_dump(model, os.path.join(out_dir, filename))
+    if isinstance(model, RandomForestClassifier):
+        flatten_forest(model).save(os.path.join(out_dir, FOREST_FILE))
+    return name, float(acc), time.perf_counter() - start
+
+
+def cv_fold(name, fold, sparse_input=False):
+    """
+    Pool task: one fold of the k-fold CV (same folds as cross_val_score(cv=k)).
+    Folds are separate tasks so they run in parallel with the model fits;
+    nesting joblib pools inside pool workers deadlocks.
+    """
+    start = time.perf_counter()
+    model, _ = make_models()[name]
+    X, y, _ = _load_split(sparse_input)
+    train_idx, test_idx = list(StratifiedKFold(n_splits=CV_FOLDS).split(X, y))[fold]
+    model.fit(_fit_input(model, X[train_idx]), y[train_idx])
+    score = accuracy_score(y[test_idx], model.predict(_fit_input(model, X[test_idx])))
+    return float(score), time.perf_counter() - start
+
+
+def load_manifest():
+    if os.path.exists(MANIFEST):
+        with open(MANIFEST) as f:
+            return json.load(f)
+    return {}
+
+
+def train_all_models(max_workers=None, force=False, svm_kind=None, sparse_input=False):
     # Ensure models directory exists
-    if not os.path.exists('models'):
-        os.makedirs('models')
-
-    # Load data
-    df = pd.read_csv('data/Training.csv')
-    df = df.dropna(axis=1)
-    
-    # Encode target
-    le = LabelEncoder()
-    df['prognosis'] = le.fit_transform(df['prognosis'])
-    
-    X = df.drop('prognosis', axis=1)
-    y = df['prognosis']
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42)
-    
-    # 1. Random Forest (PRIMARY MODEL)
-    rf = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        random_state=42,
-        n_jobs=-1
-    )
-    rf.fit(X_train, y_train)
-    rf_acc = accuracy_score(y_test, rf.predict(X_test))
-    print(f"Random Forest Accuracy: {rf_acc:.4f}")
-    
-    # 2. Naive Bayes
-    nb = GaussianNB()
-    nb.fit(X_train, y_train)
-    nb_acc = accuracy_score(y_test, nb.predict(X_test))
-    print(f"Naive Bayes Accuracy: {nb_acc:.4f}")
-    
-    # 3. SVM
-    svm = SVC(kernel='rbf', probability=True, random_state=42)
-    svm.fit(X_train, y_train)
-    svm_acc = accuracy_score(y_test, svm.predict(X_test))
-    print(f"SVM Accuracy: {svm_acc:.4f}")
-    
-    # Cross validation for RF
-    cv_scores = cross_val_score(rf, X, y, cv=2) # Using cv=2 for small placeholder dataset
-    print(f"RF Cross-Val Score: {cv_scores.mean():.4f}")
-    
-    # Save all models
-    joblib.dump(rf, 'models/random_forest_model.pkl')
-    joblib.dump(nb, 'models/naive_bayes_model.pkl')
-    joblib.dump(svm, 'models/svm_model.pkl')
-    joblib.dump(le, 'models/label_encoder.pkl')
-    
-    # Save symptom columns list
-    symptom_cols = list(X.columns)
-    joblib.dump(symptom_cols, 'models/symptom_columns.pkl')
-    
+    if not os.path.exists(MODELS_DIR):
+        os.makedirs(MODELS_DIR)
+    timings = {}
+    total_start = time.perf_counter()
+
+    # Load data (memory-mapped binary matrix, rebuilt if Training.csv changed)
+    start = time.perf_counter()
+    data = load_training_data()
+    data_hash = data_fingerprint(data)
+    timings['load data'] = time.perf_counter() - start
+
+    manifest = {} if force else load_manifest()
+    models = make_models(svm_kind)
+
+    # Skip any model whose data hash + hyperparameters match a saved artifact
+    fit_jobs, cv_jobs, accuracies = [], [], {}
+    keys = {}
+    # Sparse-fitted trees can break ties differently, so the input format is part of the key
+    fit_stage, cv_stage = ('fit-csr', 'cv-csr') if sparse_input else ('fit', 'cv')
+    for name, (model, filename) in models.items():
+        keys[name] = model_key(model, data_hash, fit_stage)
+        entry = manifest.get(name, {})
+        if entry.get('key') == keys[name] and os.path.exists(os.path.join(MODELS_DIR, filename)):
+            accuracies[name] = entry['accuracy']
+            print(f"{name}: cached artifact matches, skipping fit")
+        else:
+            fit_jobs.append(name)
+    cv_name = 'Random Forest'
+    keys['cv'] = model_key(models[cv_name][0], data_hash, cv_stage)
+    if manifest.get('cv', {}).get('key') == keys['cv']:
+        cv_score = manifest['cv']['score']
+    else:
+        cv_jobs.append(cv_name)
+
+    # New artifacts are written to a staging directory and published
+    # together at the end, so a serving process never loads a mix of sets
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=MODELS_DIR)
+    try:
+        # Fit the independent models and the CV run concurrently
+        n_tasks = len(fit_jobs) + len(cv_jobs) * CV_FOLDS
+        if n_tasks:
+            workers = max_workers or min(n_tasks, os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                fit_futures = [pool.submit(fit_model, name, svm_kind, sparse_input, staging)
+                               for name in fit_jobs]
+                cv_futures = [pool.submit(cv_fold, name, fold, sparse_input)
+                              for name in cv_jobs for fold in range(CV_FOLDS)]
+                for future in fit_futures:
+                    name, acc, seconds = future.result()
+                    accuracies[name] = acc
+                    timings[f'fit {name}'] = seconds
+                    manifest[name] = {'key': keys[name], 'accuracy': acc}
+                if cv_futures:
+                    folds = [future.result() for future in cv_futures]
+                    cv_score = float(np.mean([score for score, _ in folds]))
+                    for fold, (_, seconds) in enumerate(folds):
+                        timings[f'cv {cv_name} fold {fold + 1}'] = seconds
+                    manifest['cv'] = {'key': keys['cv'], 'score': cv_score}
+
+        for name in models:
+            print(f"{name} Accuracy: {accuracies[name]:.4f}")
+        print(f"RF Cross-Val Score: {cv_score:.4f}")
+
+        # Artifacts trained before the flat forest was saved get it exported now
+        if not os.path.exists(os.path.join(MODELS_DIR, FOREST_FILE)) and 'Random Forest' not in fit_jobs:
+            rf = joblib.load(os.path.join(MODELS_DIR, models['Random Forest'][1]))
+            flatten_forest(rf).save(os.path.join(staging, FOREST_FILE))
+
+        # Label encoder and symptom columns; rewritten only when something was refit
+        # so an all-cached run does not trigger a model hot-reload
+        if fit_jobs or not os.path.exists(os.path.join(MODELS_DIR, 'label_encoder.pkl')):
+            le = LabelEncoder()
+            le.fit(data.labels())
+            atomic_dump(le, os.path.join(staging, 'label_encoder.pkl'))
+            atomic_dump(list(data.symptoms), os.path.join(staging, 'symptom_columns.pkl'))
+
+        if os.listdir(staging):
+            publish(staging)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    with open(MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    timings['total'] = time.perf_counter() - total_start
+
+    print("\nStage wall-clock times:")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<28} {seconds:8.2f}s")
     print("✅ All models saved successfully!")
-    return rf_acc, nb_acc, svm_acc
+    return accuracies['Random Forest'], accuracies['Naive Bayes'], accuracies['SVM']
+
+
+def update_naive_bayes(cases_csv):
+    """
+    Fold newly labeled cases into the saved Naive Bayes model with
+    partial_fit; the other models are left untouched.
+    cases_csv has the data/dataset.csv shape: Disease, Symptom_1..Symptom_17.
+    Diseases must already be known to the label encoder.
+    """
+    le = joblib.load(os.path.join(MODELS_DIR, 'label_encoder.pkl'))
+    cols = joblib.load(os.path.join(MODELS_DIR, 'symptom_columns.pkl'))
+    nb_path = os.path.join(MODELS_DIR, make_models()['Naive Bayes'][1])
+    nb = joblib.load(nb_path)
+    if not hasattr(nb, 'partial_fit'):
+        raise TypeError(f"{type(nb).__name__} does not support partial_fit; retrain first")
+
+    cases = pd.read_csv(cases_csv)
+    unknown = sorted(set(cases.iloc[:, 0]) - set(le.classes_))
+    if unknown:
+        raise ValueError(f"Unknown diseases (retrain to add them): {unknown}")
+    symptom_lists = [row.dropna().astype(str).tolist() for _, row in cases.iloc[:, 1:].iterrows()]
+    X = SymptomEncoder(cols, dtype=np.uint8).encode_batch(symptom_lists)
+    nb.partial_fit(X, le.transform(cases.iloc[:, 0]))
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=MODELS_DIR)
+    try:
+        atomic_dump(nb, os.path.join(staging, os.path.basename(nb_path)))
+        publish(staging)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = load_manifest()
+    entry = manifest.setdefault('Naive Bayes', {})
+    entry['partial_fit_rows'] = entry.get('partial_fit_rows', 0) + len(cases)
+    with open(MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Naive Bayes updated with {len(cases)} cases "
+          f"({entry['partial_fit_rows']} since the last full fit)")
+
 
 if __name__ == "__main__":
-    train_all_models()
+    parser = argparse.ArgumentParser(description="Train RF, NB and SVM in parallel")
+    parser.add_argument('--workers', type=int, default=None, help="process pool size")
+    parser.add_argument('--force', action='store_true', help="refit even if cached artifacts match")
+    parser.add_argument('--svm', choices=SVM_KINDS, default=None,
+                        help="SVM variant (default: MEDIPREDICT_SVM_KIND or rbf)")
+    parser.add_argument('--sparse', action='store_true',
+                        help="fit on a CSR matrix instead of the dense memory map")
+    parser.add_argument('--nb-update', metavar='CASES_CSV', default=None,
+                        help="only partial_fit the saved Naive Bayes on new labeled cases")
+    args = parser.parse_args()
+    if args.nb_update:
+        update_naive_bayes(args.nb_update)
+    else:
+        train_all_models(max_workers=args.workers, force=args.force, svm_kind=args.svm,
+                         sparse_input=args.sparse)
@@ -1,38 +1,95 @@
 import pandas as pd
 import numpy as np
+import argparse
 import os
+from ml.dataset import BINARY_DIR, BinaryDatasetWriter, source_meta
 
-def preprocess():
-    print("🔄 Preprocessing dataset...")
-    
-    # Load original dataset
-    df = pd.read_csv('data/dataset.csv')
-    
-    # Get all unique symptoms
-    symptoms = []
-    for col in df.columns[1:]:  # Skip 'Disease'
-        symptoms.extend(df[col].dropna().unique().tolist())
-    
+SOURCE = 'data/dataset.csv'
+OUTPUT_CSV = 'data/Training.csv'
+
+
+def stack_symptoms(chunk):
+    """All filled Symptom_* cells of a chunk as one Series indexed by (row, slot)."""
+    return chunk.iloc[:, 1:].reset_index(drop=True).stack().dropna().astype(str)
+
+
+def clean_symptoms(values):
     # Clean symptoms: strip whitespace and replace spaces with underscores
-    symptoms = sorted(list(set([s.strip().replace(' ', '_') for s in symptoms if pd.notna(s)])))
-    
-    # Create empty binary matrix
-    processed_data = pd.DataFrame(0, index=np.arange(len(df)), columns=symptoms)
-    
-    # Fill matrix
-    for i in range(len(df)):
-        row_symptoms = df.iloc[i, 1:].dropna().tolist()
-        for s in row_symptoms:
-            s_clean = s.strip().replace(' ', '_')
-            if s_clean in processed_data.columns:
-                processed_data.at[i, s_clean] = 1
-                
-    # Add prognosis column
-    processed_data['prognosis'] = df['Disease']
-    
-    # Save to data/Training.csv
-    processed_data.to_csv('data/Training.csv', index=False)
-    print(f"✅ Preprocessing complete! Created 'data/Training.csv' with {len(symptoms)} symptoms and {len(df)} rows.")
+    return values.str.strip().str.replace(' ', '_', regex=False)
+
+
+def read_source(chunksize=None):
+    """Yield the source dataset as DataFrames (one, or one per chunk)."""
+    if chunksize:
+        yield from pd.read_csv(SOURCE, chunksize=chunksize)
+    else:
+        yield pd.read_csv(SOURCE)
+
+
+def scan_vocabulary(chunksize=None):
+    """First pass: sorted symptom and disease vocabularies plus the row count."""
+    symptoms, diseases, n_rows = set(), set(), 0
+    for chunk in read_source(chunksize):
+        stacked = stack_symptoms(chunk)
+        symptoms.update(clean_symptoms(stacked).unique())
+        diseases.update(chunk.iloc[:, 0].unique())
+        n_rows += len(chunk)
+    return sorted(symptoms), sorted(diseases), n_rows
+
+
+def encode_chunk(chunk, symptom_index):
+    """
+    Scatter one chunk into a uint8 row x symptom matrix in one operation:
+    stack the Symptom_* columns, map each cleaned name to its column code
+    and set X[row, code] = 1 for all pairs at once.
+    """
+    stacked = stack_symptoms(chunk)
+    rows = stacked.index.get_level_values(0).to_numpy()
+    codes = clean_symptoms(stacked).map(symptom_index).to_numpy()
+    X = np.zeros((len(chunk), len(symptom_index)), dtype=np.uint8)
+    X[rows, codes] = 1
+    return X
+
+
+def preprocess(chunksize=None, write_csv=True, write_binary=True):
+    print("🔄 Preprocessing dataset...")
+
+    # Pass 1: vocabularies (the whole file at once unless chunked)
+    symptoms, diseases, n_rows = scan_vocabulary(chunksize)
+    symptom_index = pd.Series(np.arange(len(symptoms)), index=symptoms)
+    disease_index = pd.Series(np.arange(len(diseases), dtype=np.int16), index=diseases)
+
+    writer = None
+    if write_binary:
+        writer = BinaryDatasetWriter(BINARY_DIR, n_rows, symptoms, diseases)
+
+    # Pass 2: encode and write each chunk
+    header = True
+    for chunk in read_source(chunksize):
+        X = encode_chunk(chunk, symptom_index)
+        if write_csv:
+            processed_data = pd.DataFrame(X, columns=symptoms)
+            # Add prognosis column
+            processed_data['prognosis'] = chunk.iloc[:, 0].to_numpy()
+            processed_data.to_csv(OUTPUT_CSV, index=False, header=header,
+                                  mode='w' if header else 'a')
+            header = False
+        if writer is not None:
+            writer.write(X, disease_index[chunk.iloc[:, 0]].to_numpy())
+
+    if writer is not None:
+        # Tie the binary to the CSV just written so loaders do not rebuild
+        # it; without one, to the source so it is not rebuilt from a stale CSV
+        writer.close(source_meta(OUTPUT_CSV if write_csv else SOURCE))
+    outputs = [name for name, on in ((f"'{OUTPUT_CSV}'", write_csv), (f"'{BINARY_DIR}/'", write_binary)) if on]
+    print(f"✅ Preprocessing complete! Created {' and '.join(outputs)} with {len(symptoms)} symptoms and {n_rows} rows.")
+
 
 if __name__ == "__main__":
-    preprocess()
+    parser = argparse.ArgumentParser(description="Build the binary symptom matrix from data/dataset.csv")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the source in chunks of this many rows")
+    parser.add_argument('--no-csv', action='store_true', help="skip writing data/Training.csv")
+    parser.add_argument('--no-binary', action='store_true', help=f"skip writing {BINARY_DIR}/")
+    args = parser.parse_args()
+    preprocess(chunksize=args.chunksize, write_csv=not args.no_csv, write_binary=not args.no_binary)
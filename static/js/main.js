@@ -1,10 +1,28 @@
 $(document).ready(function() {
-    // Initialize Select2 for symptom selection
+    // Initialize Select2 for symptom selection; matches come from the
+    // server-side index one page at a time
+    const PAGE_SIZE = 20;
     $('.symptom-select').select2({
         placeholder: "Search and select symptoms...",
         maximumSelectionLength: 10,
         width: '100%',
-        theme: 'classic'
+        theme: 'classic',
+        ajax: {
+            url: '/api/symptoms/search',
+            dataType: 'json',
+            delay: 150,
+            cache: true,
+            data: function(params) {
+                const page = params.page || 1;
+                return { q: params.term || '', limit: PAGE_SIZE, offset: (page - 1) * PAGE_SIZE };
+            },
+            processResults: function(data) {
+                return {
+                    results: data.results.map(r => ({ id: r.value, text: r.value })),
+                    pagination: { more: data.offset + data.results.length < data.total }
+                };
+            }
+        }
     });
 
     // Handle form validation
@@ -1,15 +1,11 @@
 import streamlit as st
-import joblib
-import pandas as pd
-import numpy as np
 import os
 from datetime import datetime
-from ml.predict import predict_disease
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+# The ml modules are imported where they are first used; reportlab and the
+# prediction code are not loaded until someone asks for a prediction
+
+# Seconds "Prepare report" waits for the PDF before asking to click again
+REPORT_TIMEOUT = float(os.environ.get('MEDIPREDICT_REPORT_TIMEOUT', 10))
 
 # Page Configuration
 st.set_page_config(
@@ -111,57 +107,16 @@ st.markdown("""
 # Load Symptoms List
 @st.cache_resource
 def get_symptoms_list():
+    from ml.features import display_symptoms
+    from ml.registry import get_models
     try:
-        symptom_cols = joblib.load('models/symptom_columns.pkl')
-        return sorted([s.replace('_', ' ').title() for s in symptom_cols])
+        symptom_cols = get_models().cols
+        return display_symptoms(symptom_cols)
     except:
         return []
 
 SYMPTOMS = get_symptoms_list()
 
-# PDF Generation Function
-def generate_pdf(result):
-    report_path = 'medical_report.pdf'
-    doc = SimpleDocTemplate(report_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Header
-    elements.append(Paragraph("MediPredict AI - Patient Report", styles['Title']))
-    elements.append(Paragraph(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Symptoms
-    elements.append(Paragraph("Symptoms Entered:", styles['Heading2']))
-    elements.append(Paragraph(", ".join(result['symptoms_entered']), styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Prediction
-    elements.append(Paragraph(f"Primary Predicted Disease: {result['primary_prediction']}", styles['Heading2']))
-    elements.append(Paragraph(f"Confidence Score: {result['confidence']}%", styles['Normal']))
-    elements.append(Paragraph(f"Risk Level: {result['risk_level']}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Description
-    elements.append(Paragraph("Disease Description:", styles['Heading2']))
-    elements.append(Paragraph(result['description'], styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Precautions
-    elements.append(Paragraph("Recommended Precautions:", styles['Heading2']))
-    for p in result['precautions']:
-        elements.append(Paragraph(f"- {p}", styles['Normal']))
-    elements.append(Spacer(1, 24))
-
-    # Disclaimer
-    elements.append(Paragraph("--- MEDICAL DISCLAIMER ---", styles['Heading3']))
-    disclaimer_style = styles['Normal']
-    disclaimer_style.textColor = colors.red
-    elements.append(Paragraph("This tool is for educational purposes only. Always consult a certified medical professional. The predictions provided by this AI should not be taken as a final medical diagnosis.", disclaimer_style))
-
-    doc.build(elements)
-    return report_path
-
 # Sidebar
 with st.sidebar:
     st.title("🏥 MediPredict AI")
@@ -197,76 +152,96 @@ with st.container():
 
 # Result Display
 if predict_btn:
+    st.session_state.pop('prediction', None)
     if not selected_symptoms or len(selected_symptoms) < 3:
         st.warning("⚠️ Please select at least 3 symptoms for an accurate prediction.")
     else:
-        result = None
         with st.status("🧠 AI Models analyzing symptoms...", expanded=True) as status:
             try:
+                from ml.features import normalize_symptom
+                from ml.predict import predict_disease
+                from ml.report import get_report_store
                 # Prepare symptoms for prediction
-                formatted_symptoms = [s.lower().replace(' ', '_') for s in selected_symptoms]
+                formatted_symptoms = [normalize_symptom(s) for s in selected_symptoms]
                 result = predict_disease(formatted_symptoms)
+                # The PDF is only rendered if the user asks for it below
+                report_token = get_report_store().put(result)
+                # Kept across reruns, so the report button does not clear the results
+                st.session_state['prediction'] = (result, report_token)
                 status.update(label="✅ Analysis Complete!", state="complete", expanded=False)
             except Exception as e:
                 status.update(label=f"❌ Analysis Failed: {e}", state="error")
                 st.error(f"❌ Prediction Error: {e}")
                 st.write("Please ensure the models are trained correctly by running `run_once.py`.")
 
-        if result:
-            st.markdown("---")
-            
-            # Top Results Section
-            res_col1, res_col2 = st.columns([2, 1])
-            
-            with res_col1:
-                st.markdown(f"""
-                <div class="result-header">
-                    <p class="prediction-title">{result['primary_prediction']}</p>
-                    <div style="margin-top: 15px;">
-                        <span class="confidence-badge">Accuracy: {result['confidence']}%</span>
-                        <span style="margin-left: 10px; font-size: 18px;">Risk Level: <b>{result['risk_level']}</b></span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown("### 📝 Disease Overview")
-                st.info(result['description'])
-                
-                st.markdown("### 🛡️ Recommended Precautions")
-                cols = st.columns(2)
-                for i, p in enumerate(result['precautions']):
-                    cols[i % 2].success(f"✅ {p.title()}")
-            
-            with res_col2:
-                st.markdown("### 📊 Model Agreement")
-                agreement = result['model_agreement']
-                st.progress(agreement / 3, text=f"{agreement}/3 Models Unified")
-                
-                st.markdown("### 🔍 Model Breakdown")
-                st.markdown(f"""
-                <div style="background-color: #161b22; padding: 15px; border-radius: 10px; border: 1px solid #30363d;">
-                    <p style="color: #8b949e; margin-bottom: 5px;">Random Forest:</p>
-                    <p style="font-weight: bold; color: #58a6ff;">{result['rf_prediction']}</p>
-                    <hr style="margin: 10px 0; border-color: #30363d;">
-                    <p style="color: #8b949e; margin-bottom: 5px;">Naive Bayes:</p>
-                    <p style="font-weight: bold; color: #58a6ff;">{result['nb_prediction']}</p>
-                    <hr style="margin: 10px 0; border-color: #30363d;">
-                    <p style="color: #8b949e; margin-bottom: 5px;">SVM:</p>
-                    <p style="font-weight: bold; color: #58a6ff;">{result['svm_prediction']}</p>
-                </div>
-                """, unsafe_allow_html=True)
+result, report_token = st.session_state.get('prediction', (None, None))
+if result:
+    st.markdown("---")
+    
+    # Top Results Section
+    res_col1, res_col2 = st.columns([2, 1])
+    
+    with res_col1:
+        st.markdown(f"""
+        <div class="result-header">
+            <p class="prediction-title">{result['primary_prediction']}</p>
+            <div style="margin-top: 15px;">
+                <span class="confidence-badge">Accuracy: {result['confidence']}%</span>
+                <span style="margin-left: 10px; font-size: 18px;">Risk Level: <b>{result['risk_level']}</b></span>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("### 📝 Disease Overview")
+        st.info(result['description'])
+        
+        st.markdown("### 🛡️ Recommended Precautions")
+        cols = st.columns(2)
+        for i, p in enumerate(result['precautions']):
+            cols[i % 2].success(f"✅ {p.title()}")
+    
+    with res_col2:
+        st.markdown("### 📊 Model Agreement")
+        agreement = result['model_agreement']
+        st.progress(agreement / 3, text=f"{agreement}/3 Models Unified")
+        
+        st.markdown("### 🔍 Model Breakdown")
+        st.markdown(f"""
+        <div style="background-color: #161b22; padding: 15px; border-radius: 10px; border: 1px solid #30363d;">
+            <p style="color: #8b949e; margin-bottom: 5px;">Random Forest:</p>
+            <p style="font-weight: bold; color: #58a6ff;">{result['rf_prediction']}</p>
+            <hr style="margin: 10px 0; border-color: #30363d;">
+            <p style="color: #8b949e; margin-bottom: 5px;">Naive Bayes:</p>
+            <p style="font-weight: bold; color: #58a6ff;">{result['nb_prediction']}</p>
+            <hr style="margin: 10px 0; border-color: #30363d;">
+            <p style="color: #8b949e; margin-bottom: 5px;">SVM:</p>
+            <p style="font-weight: bold; color: #58a6ff;">{result['svm_prediction']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Report Section
+    st.markdown("---")
+    from ml.report import get_report_store
+    reports = get_report_store()
+    pdf_bytes = None
+    if reports.status(report_token) == 'ready':
+        pdf_bytes = reports.get_pdf(report_token, timeout=0)
+    elif st.button("📄 Prepare Medical Report (PDF)"):
+        try:
+            with st.spinner("Generating report..."):
+                pdf_bytes = reports.get_pdf(report_token, timeout=REPORT_TIMEOUT)
+            if pdf_bytes is None:
+                st.info("The report is still being generated. Click again in a moment.")
+        except Exception as e:
+            st.error(f"❌ Report Error: {e}")
+    if pdf_bytes is not None:
+        st.download_button(
+            label="📥 Download Detailed Medical Report (PDF)",
+            data=pdf_bytes,
+            file_name=f"MediPredict_Report_{datetime.now().strftime('%Y%m%d')}.pdf",
+            mime="application/pdf"
+        )
             
-            # Report Section
-            st.markdown("---")
-            pdf_path = generate_pdf(result)
-            with open(pdf_path, "rb") as f:
-                st.download_button(
-                    label="📥 Download Detailed Medical Report (PDF)",
-                    data=f,
-                    file_name=f"MediPredict_Report_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf"
-                )
-                    
 
 # Performance Stats (Footer)
 st.markdown("---")